@@ -1,25 +1,150 @@
+import os
+import json
 import streamlit as st
+import metricas
 from utils import (
-    generar_datos_generales,
-    generar_syllabus_completo,
-    generar_outline_csv
-)
-from generador_clases import (
-    leer_outline_desde_sheets,
-    generar_documento_clases_completo
+    STUDENT_PERSONA,
+    INDUSTRIA_DEFAULT,
+    get_google_creds,
 )
+import cola_trabajos
+import pool_plantillas
 
 # Configuración de la página de Streamlit
 st.set_page_config(page_title="Generador de Syllabus", layout="centered")
 st.title("🧠 Generador de Syllabus y Outline")
 st.markdown("Completa los campos del curso para generar automáticamente el syllabus y el outline.")
 
+# 🔐 Los servicios de Google se construyen al primer uso; aquí solo se pide la autorización
+get_google_creds()
+
+# 🧊 Copias de plantilla y hojas pre-compartidas listas antes del primer "Generar", una vez por sesión
+if "pool_calentado" not in st.session_state:
+    pool_plantillas.calentar(get_google_creds())
+    st.session_state["pool_calentado"] = True
+
+
+# ⚙️ Los trabajos corren en hilos en segundo plano compartidos por todas las sesiones del proceso
+@st.cache_resource
+def iniciar_cola():
+    return cola_trabajos.iniciar_workers()
+
+
+iniciar_cola()
+
+
+# 📈 Endpoint Prometheus opcional (METRICAS_PUERTO), una sola vez por proceso
+@st.cache_resource
+def iniciar_metricas():
+    puerto = os.environ.get("METRICAS_PUERTO")
+    return metricas.servir_prometheus(int(puerto)) if puerto else None
+
+
+iniciar_metricas()
+
+# ⏱️ Panel opcional con tiempos y llamadas del proceso
+with st.sidebar:
+    if st.checkbox("Mostrar métricas de tiempo"):
+        datos = metricas.exportar_json()
+        st.caption("Duración (s) por etapa y por llamada")
+        st.dataframe(
+            [
+                {"métrica": h["nombre"], **h["etiquetas"], "llamadas": h["cuenta"], "promedio": h["promedio"], "total": h["suma"]}
+                for h in datos["histogramas"]
+            ],
+            hide_index=True
+        )
+        st.caption("Contadores")
+        st.dataframe(
+            [{"métrica": c["nombre"], **c["etiquetas"], "valor": c["valor"]} for c in datos["contadores"]],
+            hide_index=True
+        )
+        st.download_button("Descargar JSON", json.dumps(datos, ensure_ascii=False, indent=2), "metricas.json")
+
+# 🔁 El ID del trabajo vive en la URL: si el usuario recarga o vuelve más tarde, se retoma el seguimiento
+for tipo in ("syllabus", "clases", "regenerar_clase"):
+    if f"trabajo_{tipo}" not in st.session_state and st.query_params.get(f"trabajo_{tipo}"):
+        st.session_state[f"trabajo_{tipo}"] = st.query_params[f"trabajo_{tipo}"]
+
+
+def encolar_trabajo(tipo, parametros):
+    trabajo_id = cola_trabajos.encolar(tipo, parametros, st.session_state["google_creds"])
+    st.session_state[f"trabajo_{tipo}"] = trabajo_id
+    st.query_params[f"trabajo_{tipo}"] = trabajo_id
+
+
+def mostrar_parcial(trabajo):
+    for titulo, texto in trabajo["parcial"].items():
+        with st.expander(titulo):
+            st.markdown(texto)
+
+
+@st.fragment(run_every=2)
+def seguimiento_syllabus():
+    trabajo = cola_trabajos.obtener(st.session_state["trabajo_syllabus"])
+    if trabajo is None:
+        return
+    if trabajo["estado"] in (cola_trabajos.PENDIENTE, cola_trabajos.EN_PROCESO):
+        st.progress(trabajo["progreso"], text=f"⏳ {trabajo['mensaje']}")
+        mostrar_parcial(trabajo)
+    elif trabajo["estado"] == cola_trabajos.COMPLETADO:
+        # ✅ Guardar los links para mantenerlos visibles
+        if st.session_state.get("link_outline") != trabajo["resultado"]["link_outline"]:
+            st.session_state["link_syllabus"] = trabajo["resultado"]["link_syllabus"]
+            st.session_state["link_outline"] = trabajo["resultado"]["link_outline"]
+            st.session_state["datos_curso"] = trabajo["resultado"].get("datos_curso")
+            st.rerun()
+    else:
+        st.error(f"Ha ocurrido un error durante la generación: {trabajo['error']}")
+        st.info("Verifica que todos los campos estén completos y que la plantilla tenga los placeholders correctos.")
+        st.info("Placeholders necesarios en la plantilla: {{titulo_primer_objetivo_secundario}}, {{descripcion_primer_objetivo_secundario}}, etc.")
+
+
+@st.fragment(run_every=2)
+def seguimiento_clases():
+    trabajo = cola_trabajos.obtener(st.session_state["trabajo_clases"])
+    if trabajo is None:
+        return
+    if trabajo["estado"] in (cola_trabajos.PENDIENTE, cola_trabajos.EN_PROCESO):
+        st.progress(trabajo["progreso"], text=f"⏳ {trabajo['mensaje']}")
+        mostrar_parcial(trabajo)
+    elif trabajo["estado"] == cola_trabajos.COMPLETADO:
+        resultado = trabajo["resultado"]
+        st.success(f"✅ Clases generadas en {len(resultado['partes'])} documento(s).")
+        st.markdown(f"[📑 Ver índice de documentos]({resultado['link_indice']})", unsafe_allow_html=True)
+        for parte in resultado["partes"]:
+            desde, hasta = parte["clases"][0], parte["clases"][-1]
+            clases = f"clase {desde}" if desde == hasta else f"clases {desde} a {hasta}"
+            st.markdown(f"[📝 Parte {parte['parte']} ({clases})]({parte['link']})", unsafe_allow_html=True)
+    else:
+        st.error(f"Ocurrió un error: {trabajo['error']}")
+
+
+@st.fragment(run_every=2)
+def seguimiento_regenerar_clase():
+    trabajo = cola_trabajos.obtener(st.session_state["trabajo_regenerar_clase"])
+    if trabajo is None:
+        return
+    if trabajo["estado"] in (cola_trabajos.PENDIENTE, cola_trabajos.EN_PROCESO):
+        st.progress(trabajo["progreso"], text=f"⏳ {trabajo['mensaje']}")
+        mostrar_parcial(trabajo)
+    elif trabajo["estado"] == cola_trabajos.COMPLETADO:
+        st.success(f"✅ Clase {trabajo['resultado']['numero']} regenerada.")
+        st.markdown(f"[📝 Ver documento]({trabajo['resultado']['link_doc']})", unsafe_allow_html=True)
+    else:
+        st.error(f"Ocurrió un error: {trabajo['error']}")
+
+
 # === Inputs del curso ===
 nombre = st.text_input("Nombre del curso")
 nivel = st.selectbox("Nivel del curso", ["básico", "intermedio", "avanzado"])
 publico = st.text_area("Público objetivo (Agregar Industria)")
 objetivos_raw = st.text_area("Objetivos del curso")
 siguiente = st.text_input("Nombre del siguiente curso sugerido", value="N/A")
+modo_estructurado = st.checkbox(
+    "Generar datos del syllabus en una sola llamada (JSON estructurado)", value=True,
+    help="Pide a Gemini todos los campos, las secciones y el outline en una sola respuesta validada."
+)
 
 # ✅ NUEVO BLOQUE: Mostrar links si ya se generaron previamente
 if "link_syllabus" in st.session_state and "link_outline" in st.session_state:
@@ -31,49 +156,22 @@ if "link_syllabus" in st.session_state and "link_outline" in st.session_state:
         st.markdown(f"[📊 Ver Outline en Google Sheets]({st.session_state['link_outline']})", unsafe_allow_html=True)
 
 # Perfil fijo del estudiante tipo
-student_persona = (
-    "Usuario de negocios quiere construir productos de datos pero:\n"
-    "- No tiene el hábito o modelo de trabajo mental de tomar decisiones basadas en datos.\n"
-    "- No tiene conocimiento suficiente para traducir sus problemas a productos de datos.\n"
-    "- No tiene habilidades técnicas para manipular data.\n"
-    "- No colabora activamente con equipos de data.\n"
-    "- Tiene poco tiempo y necesita soluciones prácticas que le ayuden a avanzar ya."
-)
+student_persona = STUDENT_PERSONA
 
 # === Acción principal: Generar syllabus y outline ===
 if st.button("Generar Syllabus y Outline"):
-    with st.spinner("Generando contenido con IA..."):
-        try:
-            perfil_ingreso, objetivos_mejorados, perfil_egreso, outline, \
-            titulo1, desc1, titulo2, desc2, titulo3, desc3 = generar_datos_generales(
-                nombre, nivel, publico, student_persona, siguiente, objetivos_raw
-            )
-
-            link_syllabus = generar_syllabus_completo(
-                nombre, nivel, objetivos_mejorados, publico, siguiente,
-                perfil_ingreso, perfil_egreso, outline,
-                titulo1, desc1, titulo2, desc2, titulo3, desc3
-            )
-
-            link_outline = generar_outline_csv(
-                nombre, nivel, objetivos_mejorados, perfil_ingreso, siguiente, outline
-            )
-
-            # ✅ Guardar los links para mantenerlos visibles
-            st.session_state["link_syllabus"] = link_syllabus
-            st.session_state["link_outline"] = link_outline
-
-            st.success("✅ Syllabus y Outline generados correctamente.")
-            col1, col2 = st.columns(2)
-            with col1:
-                st.markdown(f"[📄 Ver Syllabus en Google Docs]({link_syllabus})", unsafe_allow_html=True)
-            with col2:
-                st.markdown(f"[📊 Ver Outline en Google Sheets]({link_outline})", unsafe_allow_html=True)
-
-        except Exception as e:
-            st.error(f"Ha ocurrido un error durante la generación: {str(e)}")
-            st.info("Verifica que todos los campos estén completos y que la plantilla tenga los placeholders correctos.")
-            st.info("Placeholders necesarios en la plantilla: {{titulo_primer_objetivo_secundario}}, {{descripcion_primer_objetivo_secundario}}, etc.")
+    encolar_trabajo("syllabus", {
+        "nombre": nombre,
+        "nivel": nivel,
+        "publico": publico,
+        "objetivos_raw": objetivos_raw,
+        "siguiente": siguiente,
+        "student_persona": student_persona,
+        "estructurado": modo_estructurado,
+    })
+
+if "trabajo_syllabus" in st.session_state:
+    seguimiento_syllabus()
 
 # === Generar clases completas ===
 st.markdown("---")
@@ -81,22 +179,49 @@ st.subheader("📚 Generar contenido completo de clases")
 
 link_outline_guardado = st.session_state.get("link_outline", None)
 
+por_slides = st.checkbox(
+    "Generar cada clase por rangos de slides en paralelo", value=False,
+    help="Pide los 20 slides en varios fragmentos a la vez: más rápido y sin clases cortadas por el límite de salida, "
+         "pero con más llamadas (y tokens de entrada) por clase."
+)
+
+regenerar_todas = st.checkbox(
+    "Regenerar todas las clases", value=False,
+    help="Ignora las clases ya generadas para este outline y vuelve a pedirlas todas."
+)
+
 if st.button("Generar clases desde Outline creado"):
     if link_outline_guardado:
-        with st.spinner("Generando documento con las 12 clases completas..."):
-            try:
-                clases_info = leer_outline_desde_sheets(link_outline_guardado)
-                links_docs = generar_documento_clases_completo(
-                    nombre_doc=f"Clases - {nombre}",
-                    clases_info=clases_info,
-                    perfil_estudiante=student_persona,
-                    industria="analítica de datos"
-                )
-                st.success("✅ Documento(s) de clases generado(s) exitosamente.")
-                for idx, link in enumerate(links_docs, 1):
-                    st.markdown(f"[📝 Ver documento Parte {idx}]({link})", unsafe_allow_html=True)
-            except Exception as e:
-                st.error(f"Ocurrió un error: {str(e)}")
+        encolar_trabajo("clases", {
+            "link_outline": link_outline_guardado,
+            "nombre_doc": f"Clases - {nombre}",
+            "student_persona": student_persona,
+            "industria": INDUSTRIA_DEFAULT,
+            "por_slides": por_slides,
+            "reanudar": not regenerar_todas,
+            "datos_curso": st.session_state.get("datos_curso"),
+        })
     else:
         st.warning("⚠️ Primero debes generar el syllabus y outline con el botón superior.")
         st.info("Para hacerlo, completa los campos del curso y haz clic en 'Generar Syllabus y Outline'. Luego podrás crear las clases.")
+
+if "trabajo_clases" in st.session_state:
+    seguimiento_clases()
+
+# === Regenerar una sola clase ===
+# Solo se vuelve a pedir esa clase a Gemini y se reemplaza su rango en el documento existente
+if link_outline_guardado:
+    with st.expander("🔄 Regenerar una clase"):
+        numero_clase = st.number_input("Número de clase", min_value=1, step=1, value=1)
+        if st.button("Regenerar clase"):
+            encolar_trabajo("regenerar_clase", {
+                "link_outline": link_outline_guardado,
+                "numero": int(numero_clase),
+                "student_persona": student_persona,
+                "industria": INDUSTRIA_DEFAULT,
+                "por_slides": por_slides,
+                "datos_curso": st.session_state.get("datos_curso"),
+            })
+
+if "trabajo_regenerar_clase" in st.session_state:
+    seguimiento_regenerar_clase()
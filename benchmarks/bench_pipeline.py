@@ -0,0 +1,176 @@
+"""Benchmark offline del pipeline completo contra dobles locales de Gemini y Google Workspace.
+
+Recorre generar_datos_generales → generar_syllabus_completo → generar_outline_csv →
+leer_outline_desde_sheets → generar_documento_clases_completo y reporta tiempo total, tiempo
+por etapa, llamadas a cada API y pico de memoria.
+
+Ejemplo:
+    python benchmarks/bench_pipeline.py --repeticiones 3 --latencia-gemini 0.8 --json bench.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks.fakes import ServidorGeminiFalso, WorkspaceFalso  # noqa: E402
+
+
+def _configurar_entorno(servidor: ServidorGeminiFalso, pool: int = 0, modelo: str = None):
+    # Debe ejecutarse antes de importar utils: la configuración se lee al importar
+    os.environ["POOL_PLANTILLAS_TAMANO"] = str(pool)
+    if modelo:
+        os.environ["GEMINI_MODEL"] = modelo
+    os.environ["GEMINI_BASE_URL"] = servidor.url_base
+    os.environ["GEMINI_API_KEY"] = "clave-falsa"
+    os.environ["GEMINI_CACHE_DESACTIVADA"] = "1"
+    os.environ.setdefault("GEMINI_RPM", "100000")
+    os.environ.setdefault("GEMINI_TPM", "1000000000")
+
+
+def ejecutar_pipeline(streaming: bool, clases_concurrentes: int, estructurado: bool = False,
+                      por_slides: bool = False) -> dict:
+    from utils import (
+        STUDENT_PERSONA, INDUSTRIA_DEFAULT,
+        generar_datos_generales, generar_datos_estructurados, tupla_datos_generales, secciones_estructuradas,
+        generar_syllabus_completo, generar_outline_csv,
+    )
+    from generador_clases import leer_outline_desde_sheets, generar_documento_clases_completo, datos_del_curso
+
+    tiempos = {}
+
+    def etapa(nombre, fn, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            tiempos[nombre] = round(time.perf_counter() - inicio, 4)
+
+    al_recibir_seccion = (lambda etiqueta, texto: None) if streaming else None
+    al_recibir_clase = (lambda idx, texto: None) if streaming else None
+
+    nombre = "Curso de prueba"
+    argumentos = (nombre, "básico", "retail", STUDENT_PERSONA, "N/A", "Aprender a usar datos")
+    secciones = None
+    if estructurado:
+        datos = etapa("datos_generales", generar_datos_estructurados, *argumentos)
+        datos_generales = tupla_datos_generales(datos)
+        secciones = secciones_estructuradas(datos)
+    else:
+        datos_generales = etapa("datos_generales", generar_datos_generales, *argumentos)
+    perfil_ingreso, objetivos, perfil_egreso, outline, t1, d1, t2, d2, t3, d3 = datos_generales
+    etapa("syllabus", generar_syllabus_completo,
+          nombre, "básico", objetivos, "retail", "N/A", perfil_ingreso, perfil_egreso, outline,
+          t1, d1, t2, d2, t3, d3, al_recibir=al_recibir_seccion, secciones=secciones)
+    link_outline = etapa("outline", generar_outline_csv,
+                         nombre, "básico", objetivos, perfil_ingreso, "N/A", outline)
+    clases_info = etapa("leer_outline", leer_outline_desde_sheets, link_outline)
+    etapa("clases", generar_documento_clases_completo,
+          nombre_doc=f"Clases - {nombre}", clases_info=clases_info,
+          perfil_estudiante=STUDENT_PERSONA, industria=INDUSTRIA_DEFAULT,
+          max_concurrentes=clases_concurrentes, al_recibir=al_recibir_clase, por_slides=por_slides,
+          datos_curso=datos_del_curso(nombre, "básico", "retail", datos_generales))
+    return tiempos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--latencia-gemini", type=float, default=0.5, help="Segundos por respuesta de Gemini")
+    parser.add_argument("--latencia-por-mil-caracteres", type=float, default=0.0,
+                        help="Segundos extra de Gemini por cada 1000 caracteres generados")
+    parser.add_argument("--latencia-google", type=float, default=0.15, help="Segundos por llamada a Docs/Drive/Sheets")
+    parser.add_argument("--error-gemini", type=float, default=0.0, help="Fracción de respuestas 503 de Gemini")
+    parser.add_argument("--error-google", type=float, default=0.0, help="Fracción de respuestas 503 de Google")
+    parser.add_argument("--caracteres", type=int, default=6000, help="Tamaño de cada respuesta de Gemini")
+    parser.add_argument("--clases", type=int, default=12, help="Clases en el outline simulado")
+    parser.add_argument("--clases-concurrentes", type=int, default=6)
+    parser.add_argument("--streaming", action="store_true", help="Usa streamGenerateContent")
+    parser.add_argument("--estructurado", action="store_true", help="Datos del syllabus en una sola llamada JSON")
+    parser.add_argument("--por-slides", action="store_true", help="Cada clase en rangos de slides concurrentes")
+    parser.add_argument("--pool", type=int, default=0,
+                        help="Copias de plantilla y hojas pre-creadas por tipo (se calientan antes de medir)")
+    parser.add_argument("--modelo", help="Modelo de Gemini simulado (define el mínimo del caché de contexto)")
+    parser.add_argument("--json", help="Ruta donde guardar el reporte en JSON")
+    args = parser.parse_args(argv)
+
+    servidor = ServidorGeminiFalso(
+        latencia=args.latencia_gemini, tasa_error=args.error_gemini,
+        caracteres_respuesta=args.caracteres, clases=args.clases,
+        latencia_por_mil_caracteres=args.latencia_por_mil_caracteres
+    ).iniciar()
+    _configurar_entorno(servidor, args.pool, args.modelo)
+
+    import cliente_gemini
+    import metricas
+    import pool_plantillas
+    import utils
+    from google.auth.credentials import AnonymousCredentials
+
+    cliente_gemini.GEMINI_BACKOFF_BASE = 0.05  # Los reintentos no deben dominar la medición
+    workspace = WorkspaceFalso(latencia=args.latencia_google, tasa_error=args.error_google)
+    utils.configurar_transporte_google(workspace.transporte)
+    workspace.registrar_archivo(utils.TEMPLATE_ID, "Plantilla Syllabus", "application/vnd.google-apps.document")
+
+    corridas = []
+    with utils.usar_credenciales(AnonymousCredentials()):
+        for i in range(args.repeticiones):
+            utils.generar_datos_generales.clear()
+            utils.generar_datos_estructurados.clear()
+            # El pool se rellena entre corridas, fuera de la medición, como entre sesiones reales
+            for futuro in pool_plantillas.calentar():
+                futuro.result()
+            metricas.reiniciar()
+            llamadas_gemini_antes = servidor.llamadas
+            contextos_antes = len(servidor.contextos)
+            workspace.llamadas.clear()
+
+            tracemalloc.start()
+            inicio = time.perf_counter()
+            tiempos = ejecutar_pipeline(args.streaming, args.clases_concurrentes, args.estructurado, args.por_slides)
+            total = time.perf_counter() - inicio
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            corrida = {
+                "repeticion": i + 1,
+                "total_s": round(total, 4),
+                "etapas_s": tiempos,
+                "llamadas_gemini": servidor.llamadas - llamadas_gemini_antes,
+                "contextos_gemini": len(servidor.contextos) - contextos_antes,
+                "llamadas_google": dict(sorted(workspace.llamadas.items())),
+                "total_llamadas_google": sum(workspace.llamadas.values()),
+                "pico_memoria_mb": round(pico / (1024 * 1024), 2),
+                "metricas": metricas.exportar_json(),
+            }
+            corridas.append(corrida)
+            print(
+                f"#{corrida['repeticion']}: {corrida['total_s']:.2f} s | "
+                f"Gemini {corrida['llamadas_gemini']} llamadas ({corrida['contextos_gemini']} contextos) | Google {corrida['total_llamadas_google']} llamadas | "
+                f"pico {corrida['pico_memoria_mb']} MB"
+            )
+            for nombre, segundos in tiempos.items():
+                print(f"    {nombre:<16} {segundos:8.3f} s")
+
+    servidor.detener()
+    totales = [c["total_s"] for c in corridas]
+    reporte = {
+        "parametros": vars(args),
+        "mediana_total_s": round(statistics.median(totales), 4),
+        "minimo_total_s": min(totales),
+        "corridas": corridas,
+    }
+    print(f"Mediana: {reporte['mediana_total_s']:.2f} s (mínimo {reporte['minimo_total_s']:.2f} s)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, ensure_ascii=False, indent=2)
+    return reporte
+
+
+if __name__ == "__main__":
+    main()
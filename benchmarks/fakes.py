@@ -0,0 +1,448 @@
+"""Dobles locales de Gemini y Google Workspace para medir el pipeline sin red ni cuentas reales.
+
+- `ServidorGeminiFalso`: servidor HTTP local que imita generateContent, streamGenerateContent y
+  cachedContents.
+- `WorkspaceFalso`: estado en memoria de Docs/Drive/Sheets; `transporte()` devuelve un objeto
+  compatible con httplib2.Http para pasarlo a `utils.configurar_transporte_google`.
+
+Ambos aceptan latencia, tasa de error y tamaño de respuesta configurables.
+"""
+import email
+import html
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse, unquote
+
+import httplib2
+
+
+def _dormir(latencia: float, variacion: float):
+    if latencia > 0:
+        time.sleep(max(0.0, random.uniform(latencia * (1 - variacion), latencia * (1 + variacion))))
+
+
+# =========================
+# 🤖 GEMINI FALSO
+# =========================
+# Los campos tienen el tamaño típico de una respuesta real: el prefijo común de las clases
+# (ver generador_clases.prefijo_curso) depende de ellos para alcanzar el mínimo del caché de contexto
+def _clase_falsa(n: int) -> dict:
+    return {
+        "titulo": f"Tema {n}: {texto_relleno(40)}", "conceptos": f"Concepto {n}a, Concepto {n}b, {texto_relleno(80)}",
+        "objetivos": [f"{verbo} {n}: {texto_relleno(80)}" for verbo in ("Comprender", "Aplicar", "Evaluar")],
+        "descripcion": f"Descripción de la clase {n}. {texto_relleno(220)}",
+    }
+
+
+def _outline_falso(clases: int) -> str:
+    filas = ["| Clase | Título | Conceptos Clave | Objetivo 1 | Objetivo 2 | Objetivo 3 | Descripción |",
+             "|---|---|---|---|---|---|---|"]
+    for n in range(1, clases + 1):
+        clase = _clase_falsa(n)
+        filas.append(f"| {n} | {clase['titulo']} | {clase['conceptos']} | {' | '.join(clase['objetivos'])} | "
+                     f"{clase['descripcion']} |")
+    return "\n".join(filas)
+
+
+def respuesta_datos_generales(clases: int = 12) -> str:
+    """Respuesta con el formato de etiquetas que espera `generar_datos_generales`."""
+    return "\n".join([
+        "[PERFIL_INGRESO]", "Profesionales de negocio sin experiencia técnica. " + texto_relleno(550),
+        "[OBJETIVOS]", "Tomar decisiones basadas en datos. " + texto_relleno(350),
+        "[PERFIL_EGRESO]", "Diseña y evalúa productos de datos. " + texto_relleno(550),
+        "[OUTLINE]", _outline_falso(clases),
+        "[TITULO_PRIMER_OBJETIVO_SECUNDARIO]", "Objetivo uno",
+        "[DESCRIPCION_PRIMER_OBJETIVO_SECUNDARIO]", "Descripción uno",
+        "[TITULO_SEGUNDO_OBJETIVO_SECUNDARIO]", "Objetivo dos",
+        "[DESCRIPCION_SEGUNDO_OBJETIVO_SECUNDARIO]", "Descripción dos",
+        "[TITULO_TERCER_OBJETIVO_SECUNDARIO]", "Objetivo tres",
+        "[DESCRIPCION_TERCER_OBJETIVO_SECUNDARIO]", "Descripción tres",
+    ])
+
+
+def respuesta_estructurada(clases: int = 12) -> str:
+    """Respuesta JSON con el esquema de `generar_datos_estructurados`."""
+    datos = {
+        "perfil_ingreso": "Profesionales de negocio sin experiencia técnica. " + texto_relleno(550),
+        "objetivos": "Tomar decisiones basadas en datos. " + texto_relleno(350),
+        "perfil_egreso": "Diseña y evalúa productos de datos. " + texto_relleno(550),
+        "titulo_primer_objetivo_secundario": "Objetivo uno",
+        "descripcion_primer_objetivo_secundario": "Descripción uno",
+        "titulo_segundo_objetivo_secundario": "Objetivo dos",
+        "descripcion_segundo_objetivo_secundario": "Descripción dos",
+        "titulo_tercer_objetivo_secundario": "Objetivo tres",
+        "descripcion_tercer_objetivo_secundario": "Descripción tres",
+        "generalidades_del_programa": "Generalidades del programa.",
+        "perfil_ingreso_parrafo": "Perfil de ingreso en un párrafo.",
+        "detalles_plan_estudios": "\n".join(f"{n}. Tema {n}" for n in range(1, clases + 1)),
+        "outline": [
+            {
+                "clase": n, "titulo": clase["titulo"], "conceptos_clave": clase["conceptos"],
+                "objetivo_1": clase["objetivos"][0], "objetivo_2": clase["objetivos"][1],
+                "objetivo_3": clase["objetivos"][2], "descripcion": clase["descripcion"],
+            }
+            for n, clase in ((n, _clase_falsa(n)) for n in range(1, clases + 1))
+        ],
+    }
+    return json.dumps(datos, ensure_ascii=False)
+
+
+_RANGO_SLIDES = re.compile(r"Genera ÚNICAMENTE (?:el slide (\d+)|los slides (\d+) a (\d+))")
+
+
+def texto_relleno(caracteres: int) -> str:
+    base = "Contenido generado para la prueba de rendimiento. "
+    return (base * (caracteres // len(base) + 1))[:caracteres]
+
+
+class ServidorGeminiFalso:
+    """Servidor local que responde como la API de Gemini."""
+
+    def __init__(self, latencia: float = 0.5, variacion: float = 0.2, tasa_error: float = 0.0,
+                 caracteres_respuesta: int = 6000, clases: int = 12, fragmentos_stream: int = 20,
+                 latencia_por_mil_caracteres: float = 0.0):
+        self.latencia = latencia
+        # Tiempo de generación proporcional a la salida, como en el modelo real
+        self.latencia_por_mil_caracteres = latencia_por_mil_caracteres
+        self.variacion = variacion
+        self.tasa_error = tasa_error
+        self.caracteres_respuesta = caracteres_respuesta
+        self.clases = clases
+        self.fragmentos_stream = fragmentos_stream
+        self.llamadas = 0
+        self.errores = 0
+        self.contextos = {}  # nombre -> texto del cachedContent
+        self._ids_contexto = itertools.count(1)
+        self._lock = threading.Lock()
+        self._servidor = ThreadingHTTPServer(("127.0.0.1", 0), self._manejador())
+        self._servidor.daemon_threads = True
+
+    @property
+    def url_base(self) -> str:
+        host, puerto = self._servidor.server_address
+        return f"http://{host}:{puerto}/v1beta"
+
+    def iniciar(self):
+        threading.Thread(target=self._servidor.serve_forever, name="gemini-falso", daemon=True).start()
+        return self
+
+    def detener(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def _texto(self, cuerpo: dict) -> str:
+        return "".join(
+            parte.get("text", "") for contenido in cuerpo.get("contents", []) for parte in contenido.get("parts", [])
+        )
+
+    def crear_contexto(self, cuerpo: dict) -> dict:
+        with self._lock:
+            nombre = f"cachedContents/falso{next(self._ids_contexto):05d}"
+            self.contextos[nombre] = self._texto(cuerpo)
+        return {"name": nombre, "model": cuerpo.get("model"), "expireTime": _marca_tiempo()}
+
+    def responder(self, cuerpo: dict) -> str:
+        prompt = self.contextos.get(cuerpo.get("cachedContent"), "") + self._texto(cuerpo)
+        if cuerpo.get("generationConfig", {}).get("responseSchema"):
+            return respuesta_estructurada(self.clases)
+        if "separado por etiquetas" in prompt:
+            return respuesta_datos_generales(self.clases)
+        rango = _RANGO_SLIDES.search(prompt)
+        if rango:
+            inicio = int(rango.group(1) or rango.group(2))
+            fin = int(rango.group(1) or rango.group(3))
+            # Cada slide ocupa la parte proporcional de una clase completa de 20 slides
+            return "\n\n".join(
+                f"SLIDE {n}: TÍTULO {n}\n{texto_relleno(self.caracteres_respuesta // 20)}" for n in range(inicio, fin + 1)
+            )
+        return texto_relleno(self.caracteres_respuesta)
+
+    def _manejador(self):
+        falso = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, estado: int, datos: dict, cabeceras: dict = None):
+                contenido = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+                self.send_response(estado)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(contenido)))
+                for nombre, valor in (cabeceras or {}).items():
+                    self.send_header(nombre, valor)
+                self.end_headers()
+                self.wfile.write(contenido)
+
+            def do_POST(self):
+                longitud = int(self.headers.get("Content-Length", 0))
+                cuerpo = json.loads(self.rfile.read(longitud) or b"{}")
+                with falso._lock:
+                    falso.llamadas += 1
+                _dormir(falso.latencia, falso.variacion)
+
+                if random.random() < falso.tasa_error:
+                    with falso._lock:
+                        falso.errores += 1
+                    self._json(503, {"error": {"code": 503, "message": "Sobrecarga simulada"}}, {"Retry-After": "0"})
+                    return
+
+                if self.path.split("?")[0].endswith("/cachedContents"):
+                    self._json(200, falso.crear_contexto(cuerpo))
+                    return
+                contexto = cuerpo.get("cachedContent")
+                if contexto and contexto not in falso.contextos:
+                    self._json(404, {"error": {"code": 404, "message": f"{contexto} no existe"}})
+                    return
+
+                texto = falso.responder(cuerpo)
+                # Como la API real: la salida se corta en maxOutputTokens (~4 caracteres por token)
+                fin = "STOP"
+                limite = cuerpo.get("generationConfig", {}).get("maxOutputTokens")
+                if limite and len(texto) > limite * 4:
+                    texto, fin = texto[:limite * 4], "MAX_TOKENS"
+                _dormir(len(texto) / 1000 * falso.latencia_por_mil_caracteres, falso.variacion)
+                uso = {"promptTokenCount": len(json.dumps(cuerpo)) // 4, "candidatesTokenCount": len(texto) // 4}
+                if contexto:
+                    uso["cachedContentTokenCount"] = len(falso.contextos[contexto]) // 4
+                    uso["promptTokenCount"] += uso["cachedContentTokenCount"]
+                if ":streamGenerateContent" in self.path:
+                    self._stream(texto, uso, fin)
+                else:
+                    self._json(200, {
+                        "candidates": [{"content": {"parts": [{"text": texto}]}, "finishReason": fin}],
+                        "usageMetadata": uso,
+                    })
+
+            def _stream(self, texto: str, uso: dict, fin: str = "STOP"):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                tamano = max(1, len(texto) // falso.fragmentos_stream)
+                trozos = [texto[i:i + tamano] for i in range(0, len(texto), tamano)] or [""]
+                for idx, trozo in enumerate(trozos):
+                    evento = {"candidates": [{"content": {"parts": [{"text": trozo}]}}]}
+                    if idx == len(trozos) - 1:
+                        evento["candidates"][0]["finishReason"] = fin
+                        evento["usageMetadata"] = uso
+                    self.wfile.write(f"data: {json.dumps(evento, ensure_ascii=False)}\r\n\r\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.close_connection = True
+
+        return Manejador
+
+
+# =========================
+# 📄 GOOGLE WORKSPACE FALSO
+# =========================
+class WorkspaceFalso:
+    """Estado compartido de Docs/Drive/Sheets en memoria con latencia y errores configurables."""
+
+    def __init__(self, latencia: float = 0.15, variacion: float = 0.2, tasa_error: float = 0.0):
+        self.latencia = latencia
+        self.variacion = variacion
+        self.tasa_error = tasa_error
+        self.archivos = {}      # id -> metadatos de Drive
+        self.documentos = {}    # id -> texto insertado
+        self.hojas = {}         # id -> valores
+        self.llamadas = {}      # "METODO ruta" -> cuenta
+        self.bytes_recibidos = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def transporte(self):
+        return TransporteFalso(self)
+
+    def _nuevo_archivo(self, nombre: str, tipo: str, datos: dict = None, archivo_id: str = None) -> str:
+        datos = datos or {}
+        archivo_id = archivo_id or f"falso{next(self._ids):05d}"
+        ahora = _marca_tiempo()
+        self.archivos[archivo_id] = {
+            "id": archivo_id, "name": nombre, "mimeType": tipo, "createdTime": ahora, "modifiedTime": ahora,
+            "parents": datos.get("parents", ["root"]), "appProperties": dict(datos.get("appProperties", {})),
+            "version": "1",
+        }
+        return archivo_id
+
+    def registrar_archivo(self, archivo_id: str, nombre: str, tipo: str):
+        """Da de alta un archivo existente (p. ej. la plantilla del syllabus) con un ID fijo."""
+        with self._lock:
+            self._nuevo_archivo(nombre, tipo, archivo_id=archivo_id)
+
+    def _listar(self, consulta: str) -> list:
+        """Subconjunto de la sintaxis `q` de Drive: padre, mimeType y appProperties."""
+        archivos = list(self.archivos.values())
+        for padre in re.findall(r"'([^']+)' in parents", consulta):
+            archivos = [a for a in archivos if padre in a["parents"]]
+        for tipo in re.findall(r"mimeType\s*=\s*'([^']+)'", consulta):
+            archivos = [a for a in archivos if a["mimeType"] == tipo]
+        for llave, valor in re.findall(r"appProperties has \{\s*key='([^']+)' and value='([^']+)'\s*\}", consulta):
+            archivos = [a for a in archivos if a["appProperties"].get(llave) == valor]
+        return [dict(a) for a in archivos]
+
+    def _tocar(self, archivo_id: str):
+        if archivo_id in self.archivos:
+            self.archivos[archivo_id]["modifiedTime"] = _marca_tiempo()
+
+    def atender(self, metodo: str, uri: str, cuerpo: bytes):
+        ruta = unquote(urlparse(uri).path)
+        datos = {}
+        if cuerpo and cuerpo.lstrip()[:1] == b"{":
+            datos = json.loads(cuerpo)
+
+        with self._lock:
+            clave = f"{metodo} {re.sub(r'/falso[0-9]+', '/{id}', ruta)}"
+            self.llamadas[clave] = self.llamadas.get(clave, 0) + 1
+            self.bytes_recibidos += len(cuerpo or b"")
+
+            m = re.match(r"/v1/documents/([^/:]+):batchUpdate$", ruta)
+            if m:
+                doc_id = m.group(1)
+                # El cuerpo se guarda como texto; el índice i de Docs es la posición i - 1 del texto
+                cuerpo = self.documentos.get(doc_id, "\n")
+                for solicitud in datos.get("requests", []):
+                    if "insertText" in solicitud:
+                        i = solicitud["insertText"]["location"]["index"] - 1
+                        cuerpo = cuerpo[:i] + solicitud["insertText"]["text"] + cuerpo[i:]
+                    elif "deleteContentRange" in solicitud:
+                        rango = solicitud["deleteContentRange"]["range"]
+                        cuerpo = cuerpo[:rango["startIndex"] - 1] + cuerpo[rango["endIndex"] - 1:]
+                self.documentos[doc_id] = cuerpo
+                self._tocar(doc_id)
+                return 200, {"documentId": doc_id, "replies": [{} for _ in datos.get("requests", [])]}
+
+            m = re.match(r"/v1/documents/([^/:]+)$", ruta)
+            if m and metodo == "GET":
+                return 200, {"documentId": m.group(1), "body": {"content": _contenido_docs(self.documentos.get(m.group(1), "\n"))}}
+
+            m = re.match(r"/drive/v3/files/([^/]+)/copy$", ruta)
+            if m:
+                return 200, {"id": self._nuevo_archivo(datos.get("name", "Copia"), "application/vnd.google-apps.document", datos)}
+
+            m = re.match(r"/drive/v3/files/([^/]+)/permissions$", ruta)
+            if m:
+                return 200, {"id": "permiso"}
+
+            if metodo == "POST" and ruta == "/upload/drive/v3/files" and "uploadType=multipart" in uri:
+                # Carga multipart: metadatos JSON + HTML que Drive convierte a Google Doc
+                metadatos, media = _partes_multipart(cuerpo)
+                archivo_id = self._nuevo_archivo(metadatos.get("name", "Archivo"), metadatos.get("mimeType", ""), metadatos)
+                if metadatos.get("mimeType") == "application/vnd.google-apps.document":
+                    self.documentos[archivo_id] = _html_a_texto(media.decode("utf-8"))
+                return 200, {"id": archivo_id}
+
+            if metodo == "POST" and re.match(r"(/upload)?/drive/v3/files$", ruta):
+                return 200, {"id": self._nuevo_archivo(datos.get("name", "Archivo"), datos.get("mimeType", ""), datos)}
+
+            if metodo == "GET" and ruta == "/drive/v3/files":
+                consulta = parse_qs(urlparse(uri).query).get("q", [""])[0]
+                return 200, {"files": self._listar(consulta)}
+
+            m = re.match(r"/drive/v3/files/([^/]+)$", ruta)
+            if m:
+                archivo = self.archivos.get(m.group(1))
+                if archivo is None:
+                    return 404, {"error": {"code": 404, "message": "No encontrado"}}
+                if metodo == "DELETE":
+                    del self.archivos[m.group(1)]
+                    return 204, {}
+                if metodo == "PATCH":
+                    if "name" in datos:
+                        archivo["name"] = datos["name"]
+                    for llave, valor in datos.get("appProperties", {}).items():
+                        if valor is None:
+                            archivo["appProperties"].pop(llave, None)
+                        else:
+                            archivo["appProperties"][llave] = valor
+                    parametros = parse_qs(urlparse(uri).query)
+                    quitar = ",".join(parametros.get("removeParents", [])).split(",")
+                    agregar = [p for p in ",".join(parametros.get("addParents", [])).split(",") if p]
+                    archivo["parents"] = [p for p in archivo["parents"] if p not in quitar] + agregar
+                    self._tocar(m.group(1))
+                return 200, dict(archivo)
+
+            if metodo == "POST" and ruta == "/v4/spreadsheets":
+                titulo = datos.get("properties", {}).get("title", "Hoja")
+                hoja_id = self._nuevo_archivo(titulo, "application/vnd.google-apps.spreadsheet")
+                self.hojas[hoja_id] = []
+                return 200, {"spreadsheetId": hoja_id}
+
+            m = re.match(r"/v4/spreadsheets/([^/]+)/values/(.+)$", ruta)
+            if m:
+                hoja_id = m.group(1)
+                if metodo == "PUT":
+                    self.hojas[hoja_id] = datos.get("values", [])
+                    self._tocar(hoja_id)
+                    return 200, {"updatedCells": sum(len(fila) for fila in self.hojas[hoja_id])}
+                return 200, {"range": m.group(2), "values": self.hojas.get(hoja_id, [])}
+
+        return 200, {}
+
+
+def _partes_multipart(cuerpo: bytes):
+    """(metadatos, contenido) de un cuerpo multipart/related como el que arma googleapiclient."""
+    frontera = cuerpo.split(b"\n", 1)[0].strip()[2:]
+    mensaje = email.message_from_bytes(
+        b'Content-Type: multipart/related; boundary="' + frontera + b'"\r\n\r\n' + cuerpo
+    )
+    metadatos, media = mensaje.get_payload()
+    return json.loads(metadatos.get_payload(decode=True)), media.get_payload(decode=True)
+
+
+_BLOQUES_HTML = re.compile(r"<br\s*/?>|</(?:h[1-6]|p|li|title)>", re.IGNORECASE)
+
+
+def _html_a_texto(contenido: str) -> str:
+    """Texto plano aproximado de la conversión de Drive: un párrafo por bloque HTML."""
+    inicio = contenido.find(">", contenido.find("<body")) + 1 if "<body" in contenido else 0
+    fin = contenido.find("</body>")
+    cuerpo = contenido[inicio:fin if fin >= 0 else len(contenido)]
+    texto = html.unescape(re.sub(r"<[^>]+>", "", _BLOQUES_HTML.sub("\n", cuerpo)))
+    return "\n".join(linea for linea in texto.splitlines() if linea.strip()) + "\n"
+
+
+def _contenido_docs(cuerpo: str) -> list:
+    """Estructura body.content de la API de Docs (un párrafo por línea) a partir del texto."""
+    contenido = [{"startIndex": 0, "endIndex": 1, "sectionBreak": {}}]
+    indice = 1
+    for linea in cuerpo.splitlines(keepends=True):
+        contenido.append({
+            "startIndex": indice,
+            "endIndex": indice + len(linea),
+            "paragraph": {"elements": [{"textRun": {"content": linea}}]},
+        })
+        indice += len(linea)
+    return contenido
+
+
+def _marca_tiempo() -> str:
+    ahora = time.time()
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(ahora)) + f".{int(ahora * 1000) % 1000:03d}Z"
+
+
+class TransporteFalso:
+    """Objeto compatible con httplib2.Http que enruta las peticiones a un `WorkspaceFalso`."""
+
+    def __init__(self, workspace: WorkspaceFalso):
+        self.workspace = workspace
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=None, connection_type=None):
+        _dormir(self.workspace.latencia, self.workspace.variacion)
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        if random.random() < self.workspace.tasa_error:
+            estado, datos = 503, {"error": {"code": 503, "message": "Error simulado"}}
+        else:
+            estado, datos = self.workspace.atender(method, uri, body or b"")
+        respuesta = httplib2.Response({"status": str(estado), "content-type": "application/json",
+                                       "date": formatdate(usegmt=True)})
+        return respuesta, json.dumps(datos).encode("utf-8")
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+# =========================
+# 💾 CACHÉ EN DISCO PARA RESPUESTAS DEL LLM
+# =========================
+# SQLite en modo WAL permite que varios procesos de Streamlit compartan el mismo archivo.
+CACHE_PATH = os.environ.get("GEMINI_CACHE_PATH", os.path.join(".cache", "gemini.sqlite3"))
+CACHE_TTL_SEGUNDOS = int(os.environ.get("GEMINI_CACHE_TTL", 7 * 24 * 3600))
+CACHE_MAX_BYTES = int(os.environ.get("GEMINI_CACHE_MAX_MB", 200)) * 1024 * 1024
+CACHE_DESACTIVADA = os.environ.get("GEMINI_CACHE_DESACTIVADA", "").lower() in ("1", "true", "si", "sí")
+
+
+def clave_cache(modelo: str, generation_config: dict, prompt: str) -> str:
+    """Hash estable del modelo, la configuración de generación y el prompt."""
+    contenido = json.dumps(
+        {"modelo": modelo, "config": generation_config, "prompt": prompt},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+class CacheLLM:
+    """Caché clave → texto con expiración por TTL y desalojo LRU por tamaño total."""
+
+    def __init__(self, ruta: str = CACHE_PATH, ttl: int = CACHE_TTL_SEGUNDOS, max_bytes: int = CACHE_MAX_BYTES):
+        self.ruta = ruta
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        with self._conectar() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS respuestas (
+                    clave TEXT PRIMARY KEY,
+                    valor TEXT NOT NULL,
+                    tamano INTEGER NOT NULL,
+                    creado REAL NOT NULL,
+                    accedido REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_respuestas_accedido ON respuestas (accedido)")
+
+    def _conectar(self):
+        # Una conexión por operación: sqlite3 no comparte conexiones entre hilos
+        return sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+
+    def obtener(self, clave: str):
+        ahora = time.time()
+        conn = self._conectar()
+        try:
+            fila = conn.execute("SELECT valor, creado FROM respuestas WHERE clave = ?", (clave,)).fetchone()
+            if fila is None:
+                return None
+            valor, creado = fila
+            if ahora - creado > self.ttl:
+                conn.execute("DELETE FROM respuestas WHERE clave = ?", (clave,))
+                return None
+            conn.execute("UPDATE respuestas SET accedido = ? WHERE clave = ?", (ahora, clave))
+            return valor
+        finally:
+            conn.close()
+
+    def guardar(self, clave: str, valor: str):
+        ahora = time.time()
+        tamano = len(valor.encode("utf-8"))
+        conn = self._conectar()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO respuestas (clave, valor, tamano, creado, accedido) VALUES (?, ?, ?, ?, ?)",
+                (clave, valor, tamano, ahora, ahora)
+            )
+            self._desalojar(conn, ahora)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _desalojar(self, conn, ahora: float):
+        conn.execute("DELETE FROM respuestas WHERE creado < ?", (ahora - self.ttl,))
+        total = conn.execute("SELECT COALESCE(SUM(tamano), 0) FROM respuestas").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Se eliminan las entradas usadas hace más tiempo hasta quedar dentro del límite
+        for clave, tamano in conn.execute("SELECT clave, tamano FROM respuestas ORDER BY accedido ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM respuestas WHERE clave = ?", (clave,))
+            total -= tamano
+
+    def limpiar(self):
+        conn = self._conectar()
+        try:
+            conn.execute("DELETE FROM respuestas")
+        finally:
+            conn.close()
+
+
+_cache = None
+
+
+def obtener_cache():
+    """Devuelve la caché compartida del proceso, o None si está desactivada."""
+    global _cache
+    if CACHE_DESACTIVADA:
+        return None
+    if _cache is None:
+        _cache = CacheLLM()
+    return _cache
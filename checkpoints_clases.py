@@ -0,0 +1,99 @@
+import os
+import sqlite3
+import time
+
+# =========================
+# 💾 CHECKPOINTS DE CLASES GENERADAS
+# =========================
+# Cada clase se guarda al terminar, por curso y número, para poder reanudar o regenerar solo una.
+# La huella del prompt permite saber si la clase del outline cambió desde que se guardó.
+CHECKPOINTS_PATH = os.environ.get("CHECKPOINTS_PATH", os.path.join(".cache", "checkpoints.sqlite3"))
+
+OK = "ok"
+ERROR = "error"
+
+
+def _conectar():
+    directorio = os.path.dirname(CHECKPOINTS_PATH)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    conn = sqlite3.connect(CHECKPOINTS_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS clases (
+            curso TEXT NOT NULL,
+            numero INTEGER NOT NULL,
+            estado TEXT NOT NULL,
+            contenido TEXT,
+            error TEXT,
+            documento_id TEXT,
+            huella TEXT,
+            actualizado REAL NOT NULL,
+            PRIMARY KEY (curso, numero)
+        )
+        """
+    )
+    # Bases creadas antes de guardar la huella
+    if "huella" not in {columna["name"] for columna in conn.execute("PRAGMA table_info(clases)")}:
+        conn.execute("ALTER TABLE clases ADD COLUMN huella TEXT")
+    return conn
+
+
+def guardar_clase(curso: str, numero: int, contenido: str, huella: str = None):
+    conn = _conectar()
+    try:
+        conn.execute(
+            "INSERT INTO clases (curso, numero, estado, contenido, error, huella, actualizado) "
+            "VALUES (?, ?, ?, ?, NULL, ?, ?) "
+            "ON CONFLICT (curso, numero) DO UPDATE SET estado = excluded.estado, contenido = excluded.contenido, "
+            "error = NULL, huella = excluded.huella, actualizado = excluded.actualizado",
+            (curso, numero, OK, contenido, huella, time.time())
+        )
+    finally:
+        conn.close()
+
+
+def guardar_error(curso: str, numero: int, error: str):
+    """Marca la clase como fallida sin borrar un contenido bueno anterior."""
+    conn = _conectar()
+    try:
+        conn.execute(
+            "INSERT INTO clases (curso, numero, estado, error, actualizado) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (curso, numero) DO UPDATE SET estado = excluded.estado, error = excluded.error, "
+            "actualizado = excluded.actualizado",
+            (curso, numero, ERROR, error, time.time())
+        )
+    finally:
+        conn.close()
+
+
+def asignar_documento(curso: str, numeros: list, documento_id: str):
+    conn = _conectar()
+    try:
+        conn.executemany(
+            "UPDATE clases SET documento_id = ? WHERE curso = ? AND numero = ?",
+            [(documento_id, curso, numero) for numero in numeros]
+        )
+    finally:
+        conn.close()
+
+
+def obtener_clases(curso: str) -> dict:
+    """Checkpoints del curso: numero → {estado, contenido, error, documento_id, huella}."""
+    conn = _conectar()
+    try:
+        filas = conn.execute("SELECT * FROM clases WHERE curso = ? ORDER BY numero", (curso,)).fetchall()
+    finally:
+        conn.close()
+    return {fila["numero"]: dict(fila) for fila in filas}
+
+
+def obtener_clase(curso: str, numero: int):
+    conn = _conectar()
+    try:
+        fila = conn.execute("SELECT * FROM clases WHERE curso = ? AND numero = ?", (curso, numero)).fetchone()
+    finally:
+        conn.close()
+    return dict(fila) if fila else None
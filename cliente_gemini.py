@@ -0,0 +1,136 @@
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metricas
+
+# =========================
+# 🌐 CLIENTE HTTP COMPARTIDO PARA GEMINI
+# =========================
+GEMINI_TIMEOUT = (
+    float(os.environ.get("GEMINI_TIMEOUT_CONEXION", 10)),
+    float(os.environ.get("GEMINI_TIMEOUT_LECTURA", 180)),
+)
+GEMINI_MAX_REINTENTOS = int(os.environ.get("GEMINI_MAX_REINTENTOS", 5))
+GEMINI_BACKOFF_BASE = 1.0
+GEMINI_BACKOFF_MAX = 60.0
+GEMINI_RPM = int(os.environ.get("GEMINI_RPM", 60))
+GEMINI_TPM = int(os.environ.get("GEMINI_TPM", 1_000_000))
+
+CODIGOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+
+class LimitadorTokens:
+    """Cubeta de tokens que se rellena de forma continua hasta `capacidad` unidades por minuto."""
+
+    def __init__(self, capacidad_por_minuto: float):
+        self.capacidad = float(capacidad_por_minuto)
+        self.disponible = float(capacidad_por_minuto)
+        self.tasa = self.capacidad / 60.0
+        self.actualizado = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _rellenar(self):
+        ahora = time.monotonic()
+        self.disponible = min(self.capacidad, self.disponible + (ahora - self.actualizado) * self.tasa)
+        self.actualizado = ahora
+
+    def adquirir(self, cantidad: float = 1.0):
+        """Bloquea hasta poder consumir `cantidad` unidades."""
+        # Una petición mayor que la cubeta completa solo espera a que esté llena
+        cantidad = min(cantidad, self.capacidad)
+        while True:
+            with self._lock:
+                self._rellenar()
+                if self.disponible >= cantidad:
+                    self.disponible -= cantidad
+                    return
+                espera = (cantidad - self.disponible) / self.tasa
+            time.sleep(espera)
+
+
+_limitador_peticiones = LimitadorTokens(GEMINI_RPM)
+_limitador_tokens = LimitadorTokens(GEMINI_TPM)
+
+_sesion = None
+_sesion_lock = threading.Lock()
+
+
+def obtener_sesion() -> requests.Session:
+    """Sesión única del proceso con keep-alive y un pool de conexiones dimensionado para los hilos."""
+    global _sesion
+    with _sesion_lock:
+        if _sesion is None:
+            sesion = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+            sesion.mount("https://", adaptador)
+            sesion.headers.update({"Content-Type": "application/json"})
+            _sesion = sesion
+        return _sesion
+
+
+def estimar_tokens(texto: str) -> int:
+    # Aproximación habitual de ~4 caracteres por token
+    return max(1, len(texto) // 4)
+
+
+def _espera_retry_after(response):
+    valor = response.headers.get("Retry-After")
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _espera_backoff(intento: int) -> float:
+    # Backoff exponencial con "full jitter"
+    return random.uniform(0, min(GEMINI_BACKOFF_MAX, GEMINI_BACKOFF_BASE * (2 ** intento)))
+
+
+def post_gemini(url: str, params: dict, data: dict, tokens_estimados: int = 1, stream: bool = False):
+    """POST a Gemini con límite de tasa, timeouts y reintentos ante 429/5xx y errores de red.
+
+    Devuelve la última respuesta obtenida; quien llama decide qué hacer si no es 200.
+    """
+    sesion = obtener_sesion()
+    intento = 0
+    while True:
+        with metricas.medir("gemini_espera_limitador_segundos"):
+            _limitador_peticiones.adquirir(1)
+            _limitador_tokens.adquirir(tokens_estimados)
+        try:
+            # Con stream=True esto mide el tiempo hasta las cabeceras (primer byte), no la respuesta completa
+            with metricas.medir("gemini_latencia_segundos", stream=stream):
+                response = sesion.post(url, params=params, json=data, timeout=GEMINI_TIMEOUT, stream=stream)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            metricas.incrementar("gemini_respuestas_total", codigo=type(e).__name__)
+            if intento >= GEMINI_MAX_REINTENTOS:
+                raise
+            metricas.incrementar("gemini_reintentos_total")
+            time.sleep(_espera_backoff(intento))
+            intento += 1
+            continue
+
+        metricas.incrementar("gemini_respuestas_total", codigo=response.status_code)
+        if response.status_code not in CODIGOS_REINTENTABLES or intento >= GEMINI_MAX_REINTENTOS:
+            return response
+
+        metricas.incrementar("gemini_reintentos_total")
+
+        espera = _espera_retry_after(response)
+        if espera is None:
+            espera = _espera_backoff(intento)
+        response.close()
+        time.sleep(min(espera, GEMINI_BACKOFF_MAX))
+        intento += 1
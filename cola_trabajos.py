@@ -0,0 +1,361 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+from google.oauth2.credentials import Credentials
+
+# =========================
+# 📬 COLA LOCAL DE TRABAJOS (SQLite)
+# =========================
+# Los trabajos sobreviven a recargas del navegador: la app solo encola y consulta el estado.
+# Las credenciales de cada trabajo viven solo en la memoria del proceso que lo encoló (nunca en
+# disco), así que cada proceso ejecuta sus propios trabajos.
+COLA_PATH = os.environ.get("COLA_TRABAJOS_PATH", os.path.join(".cache", "trabajos.sqlite3"))
+COLA_WORKERS = int(os.environ.get("COLA_TRABAJOS_WORKERS", 2))
+# Mientras corre, cada trabajo renueva `actualizado` cada INTERVALO_LATIDO segundos. Un trabajo
+# "en_proceso" sin latido durante COLA_TIMEOUT_LATIDO se considera huérfano y se reencola.
+COLA_TIMEOUT_LATIDO = int(os.environ.get("COLA_TRABAJOS_TIMEOUT", 15 * 60))
+INTERVALO_LATIDO = 30
+INTERVALO_PARCIAL = 1.0  # Segundos mínimos entre escrituras de texto parcial
+
+PENDIENTE = "pendiente"
+EN_PROCESO = "en_proceso"
+COMPLETADO = "completado"
+ERROR = "error"
+
+_credenciales = {}  # trabajo_id -> JSON de usuario autorizado, mientras el trabajo no termina
+_credenciales_lock = threading.Lock()
+
+
+def _conectar():
+    directorio = os.path.dirname(COLA_PATH)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    conn = sqlite3.connect(COLA_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _inicializar():
+    conn = _conectar()
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS trabajos (
+                id TEXT PRIMARY KEY,
+                tipo TEXT NOT NULL,
+                estado TEXT NOT NULL,
+                progreso REAL NOT NULL DEFAULT 0,
+                mensaje TEXT,
+                parametros TEXT NOT NULL,
+                credenciales TEXT,
+                parcial TEXT,
+                resultado TEXT,
+                error TEXT,
+                creado REAL NOT NULL,
+                actualizado REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_trabajos_estado ON trabajos (estado, creado)")
+        # Bases de versiones que guardaban las credenciales en la tabla
+        conn.execute("UPDATE trabajos SET credenciales = NULL WHERE credenciales IS NOT NULL")
+    finally:
+        conn.close()
+
+
+def encolar(tipo: str, parametros: dict, credenciales: dict) -> str:
+    """Registra un trabajo y devuelve su ID.
+
+    `credenciales` es el JSON de usuario autorizado de Google; se guarda solo en memoria y se
+    descarta al terminar el trabajo.
+    """
+    if tipo not in MANEJADORES:
+        raise ValueError(f"Tipo de trabajo desconocido: {tipo}")
+    _inicializar()
+    trabajo_id = uuid.uuid4().hex
+    ahora = time.time()
+    with _credenciales_lock:
+        _credenciales[trabajo_id] = credenciales
+    conn = _conectar()
+    try:
+        conn.execute(
+            "INSERT INTO trabajos (id, tipo, estado, mensaje, parametros, creado, actualizado) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (trabajo_id, tipo, PENDIENTE, "En cola", json.dumps(parametros, ensure_ascii=False), ahora, ahora)
+        )
+    finally:
+        conn.close()
+    return trabajo_id
+
+
+def obtener(trabajo_id: str):
+    """Estado público de un trabajo (sin credenciales), o None si no existe."""
+    _inicializar()
+    conn = _conectar()
+    try:
+        fila = conn.execute("SELECT * FROM trabajos WHERE id = ?", (trabajo_id,)).fetchone()
+    finally:
+        conn.close()
+    if fila is None:
+        return None
+    return {
+        "id": fila["id"],
+        "tipo": fila["tipo"],
+        "estado": fila["estado"],
+        "progreso": fila["progreso"],
+        "mensaje": fila["mensaje"],
+        "parametros": json.loads(fila["parametros"]),
+        "parcial": json.loads(fila["parcial"]) if fila["parcial"] else {},
+        "resultado": json.loads(fila["resultado"]) if fila["resultado"] else None,
+        "error": fila["error"],
+    }
+
+
+def _actualizar(trabajo_id: str, **campos):
+    campos["actualizado"] = time.time()
+    asignaciones = ", ".join(f"{campo} = ?" for campo in campos)
+    conn = _conectar()
+    try:
+        conn.execute(f"UPDATE trabajos SET {asignaciones} WHERE id = ?", (*campos.values(), trabajo_id))
+    finally:
+        conn.close()
+
+
+def _latir(trabajo_id: str, detener: threading.Event):
+    """Renueva el latido del trabajo hasta que termina, aunque el manejador no publique avances."""
+    while not detener.wait(INTERVALO_LATIDO):
+        conn = _conectar()
+        try:
+            conn.execute(
+                "UPDATE trabajos SET actualizado = ? WHERE id = ? AND estado = ?", (time.time(), trabajo_id, EN_PROCESO)
+            )
+        except sqlite3.Error:
+            traceback.print_exc()
+        finally:
+            conn.close()
+
+
+def _reclamar_siguiente():
+    """Toma de forma atómica el trabajo pendiente más antiguo de los que este proceso tiene credenciales.
+
+    Los trabajos en cola de este proceso también renuevan su latido aquí. Un trabajo sin latido se
+    reencola si sus credenciales siguen en memoria; si no (su proceso terminó), se marca como error
+    para que el usuario lo vuelva a lanzar.
+    """
+    with _credenciales_lock:
+        propios = list(_credenciales)
+    marcas = ", ".join("?" * len(propios))
+    conn = _conectar()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        ahora = time.time()
+        if propios:
+            conn.execute(f"UPDATE trabajos SET actualizado = ? WHERE estado = ? AND id IN ({marcas})",
+                         (ahora, PENDIENTE, *propios))
+        huerfanos = conn.execute(
+            "SELECT id, estado FROM trabajos WHERE estado IN (?, ?) AND actualizado < ?",
+            (PENDIENTE, EN_PROCESO, ahora - COLA_TIMEOUT_LATIDO)
+        ).fetchall()
+        for huerfano in huerfanos:
+            if huerfano["id"] in propios:
+                conn.execute("UPDATE trabajos SET estado = ?, mensaje = 'Reencolado' WHERE id = ?",
+                             (PENDIENTE, huerfano["id"]))
+            else:
+                conn.execute(
+                    "UPDATE trabajos SET estado = ?, mensaje = 'Error', error = ? WHERE id = ?",
+                    (ERROR, "El trabajo se interrumpió (reinicio del servidor); vuelve a lanzarlo", huerfano["id"])
+                )
+        fila = None
+        if propios:
+            fila = conn.execute(
+                f"SELECT * FROM trabajos WHERE estado = ? AND id IN ({marcas}) ORDER BY creado LIMIT 1",
+                (PENDIENTE, *propios)
+            ).fetchone()
+        if fila is not None:
+            conn.execute(
+                "UPDATE trabajos SET estado = ?, mensaje = 'Iniciando', actualizado = ? WHERE id = ?",
+                (EN_PROCESO, time.time(), fila["id"])
+            )
+        conn.execute("COMMIT")
+        return fila
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+class Reportero:
+    """Se pasa a los manejadores para publicar progreso y texto parcial del trabajo."""
+
+    def __init__(self, trabajo_id: str):
+        self.trabajo_id = trabajo_id
+        self.parcial = {}
+        self._lock = threading.Lock()
+        self._ultima_escritura = 0.0
+
+    def progreso(self, fraccion: float, mensaje: str):
+        _actualizar(self.trabajo_id, progreso=fraccion, mensaje=mensaje)
+
+    def texto_parcial(self, clave: str, texto: str):
+        # Se llama desde varios hilos y por cada fragmento: se limita la frecuencia de escritura
+        with self._lock:
+            self.parcial[clave] = texto
+            ahora = time.monotonic()
+            if ahora - self._ultima_escritura < INTERVALO_PARCIAL:
+                return
+            self._ultima_escritura = ahora
+            contenido = json.dumps(self.parcial, ensure_ascii=False)
+        _actualizar(self.trabajo_id, parcial=contenido)
+
+    def volcar(self):
+        with self._lock:
+            contenido = json.dumps(self.parcial, ensure_ascii=False)
+        _actualizar(self.trabajo_id, parcial=contenido)
+
+
+# === Manejadores de cada tipo de trabajo ===
+def _trabajo_syllabus(parametros: dict, reportero: Reportero) -> dict:
+    from utils import (
+        generar_datos_generales, generar_datos_estructurados, tupla_datos_generales, secciones_estructuradas,
+        generar_syllabus_completo, generar_outline_csv,
+    )
+    from generador_clases import datos_del_curso
+
+    reportero.progreso(0.05, "Generando datos generales del curso")
+    argumentos = (
+        parametros["nombre"], parametros["nivel"], parametros["publico"],
+        parametros["student_persona"], parametros["siguiente"], parametros["objetivos_raw"]
+    )
+    secciones = None
+    if parametros.get("estructurado"):
+        datos = generar_datos_estructurados(*argumentos)
+        datos_generales = tupla_datos_generales(datos)
+        secciones = secciones_estructuradas(datos)
+    else:
+        datos_generales = generar_datos_generales(*argumentos)
+    perfil_ingreso, objetivos_mejorados, perfil_egreso, outline, \
+    titulo1, desc1, titulo2, desc2, titulo3, desc3 = datos_generales
+
+    reportero.progreso(0.35, "Generando syllabus")
+    link_syllabus = generar_syllabus_completo(
+        parametros["nombre"], parametros["nivel"], objetivos_mejorados, parametros["publico"], parametros["siguiente"],
+        perfil_ingreso, perfil_egreso, outline,
+        titulo1, desc1, titulo2, desc2, titulo3, desc3,
+        al_recibir=reportero.texto_parcial,
+        secciones=secciones
+    )
+
+    reportero.progreso(0.85, "Creando outline en Google Sheets")
+    link_outline = generar_outline_csv(
+        parametros["nombre"], parametros["nivel"], objetivos_mejorados, perfil_ingreso, parametros["siguiente"], outline
+    )
+    # Los datos del curso viajan con el resultado para compartirlos después con todas las clases
+    datos_curso = datos_del_curso(parametros["nombre"], parametros["nivel"], parametros["publico"], datos_generales)
+    return {"link_syllabus": link_syllabus, "link_outline": link_outline, "datos_curso": datos_curso}
+
+
+def _trabajo_clases(parametros: dict, reportero: Reportero) -> dict:
+    from utils import id_desde_url_sheets
+    from generador_clases import leer_outline_desde_sheets, generar_documento_clases_completo
+
+    reportero.progreso(0.05, "Leyendo outline")
+    clases_info = leer_outline_desde_sheets(parametros["link_outline"])
+
+    def al_recibir(idx, texto):
+        reportero.texto_parcial(f"Clase {clases_info[idx]['numero']}: {clases_info[idx]['titulo']}", texto)
+
+    reportero.progreso(0.1, f"Generando {len(clases_info)} clases")
+    return generar_documento_clases_completo(
+        nombre_doc=parametros["nombre_doc"],
+        clases_info=clases_info,
+        perfil_estudiante=parametros["student_persona"],
+        industria=parametros["industria"],
+        al_recibir=al_recibir,
+        # El outline identifica al curso: un reintento reutiliza las clases ya generadas que no cambiaron
+        curso_id=id_desde_url_sheets(parametros["link_outline"]),
+        reanudar=parametros.get("reanudar", True),
+        datos_curso=parametros.get("datos_curso"),
+        por_slides=parametros.get("por_slides", False)
+    )
+
+
+def _trabajo_regenerar_clase(parametros: dict, reportero: Reportero) -> dict:
+    from utils import id_desde_url_sheets
+    from generador_clases import leer_outline_desde_sheets, regenerar_clase
+
+    reportero.progreso(0.05, "Leyendo outline")
+    clases_info = leer_outline_desde_sheets(parametros["link_outline"])
+    numero = int(parametros["numero"])
+    if not 1 <= numero <= len(clases_info):
+        raise ValueError(f"El outline tiene {len(clases_info)} clases; no existe la clase {numero}")
+    clase_info = clases_info[numero - 1]
+
+    def al_recibir(texto):
+        reportero.texto_parcial(f"Clase {clase_info['numero']}: {clase_info['titulo']}", texto)
+
+    reportero.progreso(0.1, f"Regenerando la clase {numero}")
+    link_doc = regenerar_clase(
+        id_desde_url_sheets(parametros["link_outline"]), numero, clase_info,
+        parametros["student_persona"], parametros["industria"], al_recibir=al_recibir,
+        por_slides=parametros.get("por_slides", False), clases_info=clases_info,
+        datos_curso=parametros.get("datos_curso")
+    )
+    return {"link_doc": link_doc, "numero": numero}
+
+
+MANEJADORES = {
+    "syllabus": _trabajo_syllabus,
+    "clases": _trabajo_clases,
+    "regenerar_clase": _trabajo_regenerar_clase,
+}
+
+
+def _ejecutar(fila):
+    from utils import SCOPES, usar_credenciales
+
+    trabajo_id = fila["id"]
+    reportero = Reportero(trabajo_id)
+    detener_latido = threading.Event()
+    threading.Thread(target=_latir, args=(trabajo_id, detener_latido), name=f"latido-{trabajo_id[:8]}",
+                     daemon=True).start()
+    try:
+        with _credenciales_lock:
+            info = _credenciales[trabajo_id]
+        creds = Credentials.from_authorized_user_info(info, SCOPES)
+        with usar_credenciales(creds):
+            resultado = MANEJADORES[fila["tipo"]](json.loads(fila["parametros"]), reportero)
+        reportero.volcar()
+        _actualizar(trabajo_id, estado=COMPLETADO, progreso=1.0, mensaje="Completado",
+                    resultado=json.dumps(resultado, ensure_ascii=False))
+    except Exception as e:
+        traceback.print_exc()
+        _actualizar(trabajo_id, estado=ERROR, mensaje="Error", error=str(e))
+    finally:
+        detener_latido.set()
+        with _credenciales_lock:
+            _credenciales.pop(trabajo_id, None)
+
+
+def _bucle_worker(detener: threading.Event):
+    while not detener.is_set():
+        fila = _reclamar_siguiente()
+        if fila is None:
+            detener.wait(1.0)
+            continue
+        _ejecutar(fila)
+
+
+def iniciar_workers(n: int = COLA_WORKERS) -> threading.Event:
+    """Arranca `n` hilos daemon que procesan la cola. Devuelve el evento para detenerlos."""
+    _inicializar()
+    detener = threading.Event()
+    for i in range(n):
+        threading.Thread(target=_bucle_worker, args=(detener,), name=f"cola-trabajos-{i}", daemon=True).start()
+    return detener
@@ -0,0 +1,108 @@
+import hashlib
+import os
+import threading
+import time
+
+import requests
+
+import metricas
+from cliente_gemini import estimar_tokens, post_gemini
+
+# =========================
+# 🧩 CONTEXTO COMPARTIDO EN CACHÉ DE GEMINI (cachedContents)
+# =========================
+# El prefijo común a varias llamadas de un curso (instrucciones, perfiles, outline) se sube una
+# sola vez y cada llamada envía solo su parte variable. Si el contexto no se puede crear, las
+# llamadas vuelven a mandar el prompt completo.
+CONTEXTO_TTL = int(os.environ.get("GEMINI_CONTEXTO_TTL", 15 * 60))
+# No se reutiliza un contexto al que le quede menos que esto: podría expirar a mitad de la llamada
+CONTEXTO_MARGEN = 60
+# La API rechaza contenidos por debajo de un mínimo de tokens que depende del modelo (documentación de
+# context caching de Gemini). GEMINI_CONTEXTO_MIN_TOKENS lo fija a mano para modelos que no están aquí.
+MIN_TOKENS_POR_MODELO = {
+    "gemini-2.5-flash": 1024,
+    "gemini-2.5-pro": 2048,
+    "gemini-2.0-flash": 4096,
+    "gemini-1.5": 4096,
+}
+CONTEXTO_MIN_TOKENS = int(os.environ.get("GEMINI_CONTEXTO_MIN_TOKENS", 0))
+CONTEXTO_DESACTIVADO = os.environ.get("GEMINI_CONTEXTO_DESACTIVADO") == "1"
+
+_contextos = {}  # clave -> (nombre del cachedContent o None si no se pudo crear, expira en monotonic)
+_creando = {}    # clave -> Lock, para que las llamadas concurrentes de un curso creen un solo contexto
+_lock = threading.Lock()
+
+
+def _clave(modelo: str, prefijo: str) -> str:
+    return hashlib.sha256(f"{modelo}\n{prefijo}".encode("utf-8")).hexdigest()
+
+
+def min_tokens(modelo: str) -> int:
+    if CONTEXTO_MIN_TOKENS:
+        return CONTEXTO_MIN_TOKENS
+    for familia, minimo in MIN_TOKENS_POR_MODELO.items():
+        if modelo.startswith(familia):
+            return minimo
+    return max(MIN_TOKENS_POR_MODELO.values())
+
+
+def _purgar_expirados(ahora: float):
+    for clave in [c for c, (_, expira) in _contextos.items() if expira <= ahora]:
+        del _contextos[clave]
+        _creando.pop(clave, None)
+
+
+def _crear(base_url: str, modelo: str, api_key: str, prefijo: str):
+    data = {
+        "model": f"models/{modelo}",
+        "contents": [{"role": "user", "parts": [{"text": prefijo}]}],
+        "ttl": f"{CONTEXTO_TTL}s",
+    }
+    try:
+        response = post_gemini(f"{base_url}/cachedContents", params={"key": api_key}, data=data,
+                               tokens_estimados=estimar_tokens(prefijo))
+    except (requests.ConnectionError, requests.Timeout):
+        metricas.incrementar("gemini_contexto_total", resultado="error")
+        return None
+    if response.status_code != 200:
+        metricas.incrementar("gemini_contexto_total", resultado="error")
+        return None
+    metricas.incrementar("gemini_contexto_total", resultado="creado")
+    return response.json().get("name")
+
+
+def obtener_contexto(base_url: str, modelo: str, api_key: str, prefijo: str):
+    """Nombre del cachedContent con `prefijo`, creándolo si hace falta; None si no está disponible.
+
+    Un fallo al crearlo también se recuerda durante `CONTEXTO_TTL` para no reintentarlo en cada llamada.
+    """
+    if CONTEXTO_DESACTIVADO or not prefijo or estimar_tokens(prefijo) < min_tokens(modelo):
+        return None
+    clave = _clave(modelo, prefijo)
+    with _lock:
+        _purgar_expirados(time.monotonic())
+        lock = _creando.setdefault(clave, threading.Lock())
+
+    with lock:
+        entrada = _contextos.get(clave)
+        if entrada is not None and time.monotonic() < entrada[1]:
+            if entrada[0] is not None:
+                metricas.incrementar("gemini_contexto_total", resultado="reutilizado")
+            return entrada[0]
+
+        inicio = time.monotonic()
+        nombre = _crear(base_url, modelo, api_key, prefijo)
+        vigencia = CONTEXTO_TTL - CONTEXTO_MARGEN if nombre else CONTEXTO_TTL
+        with _lock:
+            _contextos[clave] = (nombre, inicio + vigencia)
+        return nombre
+
+
+def invalidar_contexto(modelo: str, prefijo: str, nombre: str):
+    """Olvida `nombre` (p. ej. si la API dice que expiró) para que la próxima llamada cree otro."""
+    clave = _clave(modelo, prefijo)
+    with _lock:
+        entrada = _contextos.get(clave)
+        if entrada is not None and entrada[0] == nombre:
+            del _contextos[clave]
+    metricas.incrementar("gemini_contexto_total", resultado="invalidado")
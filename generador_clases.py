@@ -1,38 +1,58 @@
-import pandas as pd
+import hashlib
+import os
 import re
-from utils import call_gemini, docs_service, drive_service, sheets_service
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import checkpoints_clases
+import metricas
+from cliente_gemini import estimar_tokens
+from contexto_gemini import CONTEXTO_DESACTIVADO, min_tokens
+from tabla_markdown import clases_desde_filas
+from render_documentos import clase_a_html, clase_a_parrafos, indice_a_html, documento_html, exportar_html
+from utils import (
+    GEMINI_MODEL, generar_texto, call_gemini_con_fin, get_docs_service, get_drive_service, get_sheets_service, enviar_tarea, ConstructorDocumento,
+    subir_documento_html, id_desde_url_sheets, fecha_modificacion, sin_cambios, obtener_outline_en_memoria,
+    guardar_outline_en_memoria,
+)
 
+# Número máximo de clases que se piden a Gemini al mismo tiempo
+MAX_CLASES_CONCURRENTES = 6
+# Documentos que se suben y comparten al mismo tiempo
+MAX_DOCUMENTOS_CONCURRENTES = 8
+# Presupuesto de texto por documento: los Docs muy grandes tardan en abrir y editarse
+MAX_CARACTERES_POR_DOCUMENTO = int(os.environ.get("CLASES_MAX_CARACTERES_DOC", 80_000))
 
-def leer_outline_desde_sheets(sheet_url: str) -> list:
-    match = re.search(r"/d/([a-zA-Z0-9-_]+)", sheet_url)
-    spreadsheet_id = match.group(1) if match else None
-    if not spreadsheet_id:
-        raise ValueError("URL de Google Sheets no válida")
 
-    sheet_data = sheets_service.spreadsheets().values().get(
-        spreadsheetId=spreadsheet_id, range="A1:G100"
+@metricas.cronometrar("leer_outline")
+def leer_outline_desde_sheets(sheet_url: str, verificar: bool = True) -> list:
+    """Devuelve las clases del outline.
+
+    Si el outline está en memoria, solo se consulta el modifiedTime de la hoja (una llamada de
+    metadatos) y se vuelve a leer únicamente si es posterior a lo que hay en memoria. Con `verificar=False` (justo después de crearla, sin edición posible)
+    se usa la copia en memoria sin ninguna llamada.
+    """
+    spreadsheet_id = id_desde_url_sheets(sheet_url)
+
+    en_memoria = obtener_outline_en_memoria(spreadsheet_id)
+    if en_memoria is not None and not verificar:
+        return clases_desde_filas(en_memoria[1][1:])
+    modificado = fecha_modificacion(spreadsheet_id)
+    if en_memoria is not None and sin_cambios(modificado, en_memoria[0]):
+        return clases_desde_filas(en_memoria[1][1:])
+
+    # Rango abierto: la API devuelve solo las filas con datos, sin un tope fijo de filas
+    sheet_data = get_sheets_service().spreadsheets().values().get(
+        spreadsheetId=spreadsheet_id, range="A:G"
     ).execute()
     values = sheet_data.get("values", [])
+    guardar_outline_en_memoria(spreadsheet_id, modificado, values)
 
-    headers = values[0]
-    rows = values[1:]
-    clases = []
-    for row in rows:
-        if len(row) < 7:
-            continue
-        clase = {
-            "numero": row[0],
-            "titulo": row[1],
-            "conceptos": row[2],
-            "objetivos": [row[3], row[4], row[5]],
-            "descripcion": row[6]
-        }
-        clases.append(clase)
-    return clases
-
-
-def generar_clase_con_prompt(clase_info: dict, perfil_estudiante: str, industria: str) -> str:
-    prompt = f"""
+    # La primera fila son los encabezados
+    return clases_desde_filas(values[1:])
+
+
+# Instrucciones comunes a todas las clases de un curso. Junto con los datos y el temario del curso
+# (ver `prefijo_curso`) forman el prefijo en caché; cada clase envía únicamente su contexto.
+PREAMBULO_CLASE = """
         Actúa como un **diseñador instruccional experto y un tutor experimentado** con profunda experiencia en tecnología,
         negocios y analítica de datos. Tu tarea es generar **TODO el contenido detallado y final de una clase compuesta por 20 slides**,
         **aplicando los principios de la ciencia del aprendizaje (LearnLM)** para maximizar la comprensión, la retención
@@ -70,66 +90,420 @@ def generar_clase_con_prompt(clase_info: dict, perfil_estudiante: str, industria
         19. Actividad práctica   
         20. Cierre con resumen y llamada a la acción 
 
-        Contexto:
+        No uses frases como “puedes incluir” o “se recomienda mostrar”. Escribe el contenido real final como si fuera a presentarse en un aula o sesión empresarial. Evita repeticiones y asegura profundidad en cada slide.
+
+        Contexto del curso:
+
+        - Perfil del estudiante: {perfil_estudiante}
+        - Industria de enfoque: {industria}
+"""
+
+
+def datos_del_curso(nombre: str, nivel: str, publico: str, datos_generales: tuple) -> dict:
+    """Datos del curso (de `generar_datos_generales`) que se comparten con todas sus clases."""
+    perfil_ingreso, objetivos, perfil_egreso, _, titulo1, desc1, titulo2, desc2, titulo3, desc3 = datos_generales
+    return {
+        "nombre": nombre,
+        "nivel": nivel,
+        "publico": publico,
+        "objetivos": objetivos,
+        "perfil_ingreso": perfil_ingreso,
+        "perfil_egreso": perfil_egreso,
+        "objetivos_secundarios": [f"{titulo1}: {desc1}", f"{titulo2}: {desc2}", f"{titulo3}: {desc3}"],
+    }
+
+
+_CAMPOS_CURSO = [
+    ("nombre", "Curso"), ("nivel", "Nivel"), ("publico", "Público objetivo"), ("objetivos", "Objetivos del curso"),
+    ("perfil_ingreso", "Perfil de ingreso"), ("perfil_egreso", "Perfil de egreso"),
+]
+
+
+def _objetivos_texto(objetivos) -> str:
+    return "; ".join(objetivos) if isinstance(objetivos, list) else str(objetivos)
+
+
+def prefijo_curso(perfil_estudiante: str, industria: str, clases_info: list, datos_curso: dict = None) -> str:
+    """Prefijo común a todas las llamadas de un curso: instrucciones, datos del curso y temario completo.
+
+    Es el mismo para cada clase y cada rango de slides, así que se sube una vez como contexto en
+    caché; el temario además le permite al modelo conectar las clases sin repetirlas. Si el prefijo
+    completo no alcanza el mínimo del caché para GEMINI_MODEL, se devuelven solo las instrucciones:
+    sin caché, los datos y el temario se reenviarían en cada llamada.
+    """
+    instrucciones = PREAMBULO_CLASE.format(perfil_estudiante=perfil_estudiante, industria=industria)
+    if CONTEXTO_DESACTIVADO:
+        return instrucciones
+    datos_curso = datos_curso or {}
+    lineas = [f"        - {etiqueta}: {datos_curso[campo]}" for campo, etiqueta in _CAMPOS_CURSO if datos_curso.get(campo)]
+    lineas += [f"        - Objetivo secundario: {objetivo}" for objetivo in datos_curso.get("objetivos_secundarios", [])]
+    temario = "\n".join(
+        f"        {clase['numero']}. {clase['titulo']}: {clase['descripcion']} "
+        f"(Conceptos clave: {clase['conceptos']}. Objetivos: {_objetivos_texto(clase['objetivos'])})"
+        for clase in clases_info
+    )
+    completo = instrucciones + "\n".join(lineas) + f"""
+
+        Temario completo del curso (cada clase se genera por separado: conecta con las clases anteriores
+        y siguientes sin repetir su contenido):
+
+{temario}
+"""
+    if estimar_tokens(completo) < min_tokens(GEMINI_MODEL):
+        metricas.incrementar("clase_prefijo_total", tipo="instrucciones")
+        return instrucciones
+    metricas.incrementar("clase_prefijo_total", tipo="curso")
+    return completo
+
+
+def _contexto_clase(clase_info: dict) -> str:
+    return f"""
+        Contexto de la clase:
 
         - Título de la clase: {clase_info['titulo']}
         - Descripción: {clase_info['descripcion']}
         - Objetivos: {clase_info['objetivos']}
         - Conceptos clave: {clase_info['conceptos']}
-        - Perfil del estudiante: {perfil_estudiante}
-        - Industria de enfoque: {industria}
+        """
 
-        No uses frases como “puedes incluir” o “se recomienda mostrar”. Escribe el contenido real final como si fuera a presentarse en un aula o sesión empresarial. Evita repeticiones y asegura profundidad en cada slide.
+
+# === CLASES POR RANGOS DE SLIDES ===
+# Una clase completa de 20 slides puede superar maxOutputTokens y es la llamada más lenta del pipeline.
+# En este modo cada clase se pide en varios rangos de slides en paralelo y se vuelve a unir.
+TOTAL_SLIDES = 20
+SLIDES_POR_FRAGMENTO = int(os.environ.get("CLASES_SLIDES_POR_FRAGMENTO", 5))
+MAX_REINTENTOS_FRAGMENTO = 2
+_MARCA_SLIDE = re.compile(r"^[#*\s]*SLIDE\s+(\d+)\b", re.IGNORECASE | re.MULTILINE)
+
+
+def rangos_slides(total: int = TOTAL_SLIDES, por_fragmento: int = SLIDES_POR_FRAGMENTO) -> list:
+    por_fragmento = max(1, por_fragmento)
+    return [(inicio, min(inicio + por_fragmento - 1, total)) for inicio in range(1, total + 1, por_fragmento)]
+
+
+def separar_slides(texto: str) -> dict:
+    """Divide un texto en slides por sus líneas "SLIDE n:". Si un número se repite, se conserva el primero."""
+    marcas = list(_MARCA_SLIDE.finditer(texto))
+    slides = {}
+    for marca, siguiente in zip(marcas, marcas[1:] + [None]):
+        numero = int(marca.group(1))
+        if numero in slides:
+            metricas.incrementar("clase_slides_total", resultado="duplicado")
+            continue
+        slides[numero] = texto[marca.start():siguiente.start() if siguiente else len(texto)].strip()
+    return slides
+
+
+def _contiguos(numeros: list) -> list:
+    """Agrupa números ordenados en rangos (inicio, fin) consecutivos."""
+    rangos = []
+    for numero in numeros:
+        if rangos and numero == rangos[-1][1] + 1:
+            rangos[-1] = (rangos[-1][0], numero)
+        else:
+            rangos.append((numero, numero))
+    return rangos
+
+
+def _generar_rango_slides(prefijo: str, contexto: str, inicio: int, fin: int, refrescar: bool = False,
+                          reintentos: int = MAX_REINTENTOS_FRAGMENTO) -> dict:
+    """Pide los slides `inicio`..`fin` y devuelve {número: texto} de los que llegaron completos.
+
+    Si la respuesta se cortó (finishReason MAX_TOKENS), el último slide se descarta y lo faltante
+    se vuelve a pedir partido a la mitad; si el modelo omitió slides, se piden de nuevo.
+    """
+    rango = f"el slide {inicio}" if inicio == fin else f"los slides {inicio} a {fin}"
+    prompt = contexto + f"""
+        Genera ÚNICAMENTE {rango} de la estructura de {TOTAL_SLIDES} slides; el resto de la clase se genera por separado.
+        Empieza cada slide con una línea "SLIDE n: TÍTULO", donde n es su número dentro de los {TOTAL_SLIDES} slides.
         """
-    return call_gemini(prompt)
-
-
-def generar_documento_clases_completo(nombre_doc: str, clases_info: list, perfil_estudiante: str, industria: str) -> list:
-    docs_links = []
-    partes = [clases_info[:6], clases_info[6:]]
-
-    for parte_idx, parte in enumerate(partes, 1):
-        # Crear documento vacío
-        documento = drive_service.files().create(
-            body={"name": f"{nombre_doc} - Parte {parte_idx}", "mimeType": "application/vnd.google-apps.document"},
-            fields="id"
-        ).execute()
-        document_id = documento["id"]
-
-        # Insertar clase por clase en orden
-        cursor_index = 1  # se va actualizando manualmente
-        for i, clase in enumerate(parte, 1):
-            try:
-                contenido_clase = generar_clase_con_prompt(clase, perfil_estudiante, industria)
-            except Exception as e:
-                contenido_clase = f"[ERROR al generar esta clase]: {e}"
-
-            texto = f"\n\nCLASE {i + (parte_idx - 1) * 6}: {clase['titulo']}\n\n{contenido_clase.strip()}\n"
-
-            docs_service.documents().batchUpdate(
-                documentId=document_id,
-                body={
-                    "requests": [
-                        {
-                            "insertText": {
-                                "location": {"index": cursor_index},
-                                "text": texto
-                            }
-                        }
-                    ]
-                }
-            ).execute()
-
-            # Actualiza la posición para el siguiente insert
-            cursor_index += len(texto)
-
-        # Dar permisos de edición en dominio
-        drive_service.permissions().create(
-            fileId=document_id,
-            body={"type": "domain", "role": "writer", "domain": "datarebels.mx"},
-            fields="id"
-        ).execute()
-
-        docs_links.append(f"https://docs.google.com/document/d/{document_id}/edit")
-
-    return docs_links
+    texto, razon_fin = call_gemini_con_fin(prompt, refrescar=refrescar, prefijo=prefijo)
+    slides = {n: t for n, t in separar_slides(texto).items() if inicio <= n <= fin}
+    truncada = razon_fin == "MAX_TOKENS"
+    if truncada and slides:
+        # El último slide recibido puede estar incompleto
+        slides.pop(max(slides))
+    metricas.incrementar("clase_fragmentos_total", resultado="truncado" if truncada else "ok")
+
+    faltantes = [n for n in range(inicio, fin + 1) if n not in slides]
+    if faltantes and reintentos > 0:
+        subrangos = []
+        for sub_inicio, sub_fin in _contiguos(faltantes):
+            mitad = (sub_inicio + sub_fin) // 2
+            if truncada and sub_fin > sub_inicio:
+                subrangos += [(sub_inicio, mitad), (mitad + 1, sub_fin)]
+            else:
+                subrangos.append((sub_inicio, sub_fin))
+        for sub_inicio, sub_fin in subrangos:
+            # Sin caché: el mismo rango pedido otra vez devolvería la misma respuesta incompleta
+            slides.update(_generar_rango_slides(prefijo, contexto, sub_inicio, sub_fin, True, reintentos - 1))
+    return slides
+
+
+def generar_clase_por_slides(clase_info: dict, perfil_estudiante: str, industria: str, al_recibir=None,
+                             refrescar: bool = False, prefijo: str = None) -> str:
+    """Genera la clase en rangos de slides concurrentes y une los fragmentos en orden.
+
+    Lanza ValueError si, tras los reintentos, falta algún slide. `al_recibir(texto)` recibe lo
+    unido hasta el momento cada vez que termina un rango.
+    """
+    prefijo = prefijo or prefijo_curso(perfil_estudiante, industria, [clase_info])
+    contexto = _contexto_clase(clase_info)
+    rangos = rangos_slides()
+    slides = {}
+
+    def unir():
+        return "\n\n".join(slides[n] for n in sorted(slides))
+
+    with ThreadPoolExecutor(max_workers=len(rangos)) as executor:
+        futuros = [
+            enviar_tarea(executor, _generar_rango_slides, prefijo, contexto, inicio, fin, refrescar)
+            for inicio, fin in rangos
+        ]
+        for futuro in as_completed(futuros):
+            slides.update(futuro.result())
+            if al_recibir is not None:
+                al_recibir(unir())
+
+    faltantes = [n for n in range(1, TOTAL_SLIDES + 1) if n not in slides]
+    if faltantes:
+        metricas.incrementar("clase_slides_total", len(faltantes), resultado="faltante")
+        raise ValueError(f"Faltan los slides {', '.join(map(str, faltantes))} de la clase '{clase_info['titulo']}'")
+    return unir()
+
+
+@metricas.cronometrar("clase")
+def generar_clase_con_prompt(clase_info: dict, perfil_estudiante: str, industria: str, al_recibir=None,
+                             refrescar: bool = False, por_slides: bool = False, prefijo: str = None) -> str:
+    """Genera el contenido de una clase de 20 slides; con `por_slides`, en rangos concurrentes.
+
+    `prefijo` es el de `prefijo_curso` para todo el curso; sin él se usa uno con solo esta clase.
+    """
+    prefijo = prefijo or prefijo_curso(perfil_estudiante, industria, [clase_info])
+    if por_slides:
+        return generar_clase_por_slides(clase_info, perfil_estudiante, industria, al_recibir, refrescar, prefijo)
+    return generar_texto(_contexto_clase(clase_info), al_recibir, refrescar, prefijo=prefijo)
+
+
+def huella_clase(clase_info: dict, perfil_estudiante: str, industria: str, por_slides: bool = False) -> str:
+    """Hash de todo lo que determina el contenido de una clase: preámbulo, contexto de la clase y modo.
+
+    Un checkpoint solo se reutiliza si su huella coincide, así que editar la clase en el outline
+    (o cambiar de modo) hace que se vuelva a generar. El temario del resto del curso no entra en la
+    huella: editar una clase no invalida las demás.
+    """
+    prefijo = PREAMBULO_CLASE.format(perfil_estudiante=perfil_estudiante, industria=industria)
+    modo = f"por_slides:{TOTAL_SLIDES}/{SLIDES_POR_FRAGMENTO}" if por_slides else "completa"
+    return hashlib.sha256(f"{modo}\n{prefijo}\n{_contexto_clase(clase_info)}".encode("utf-8")).hexdigest()
+
+
+def texto_clase(numero: int, clase: dict, contenido: str) -> str:
+    """Bloque de texto de una clase tal como se escribe en el documento."""
+    return f"\n\nCLASE {numero}: {clase['titulo']}\n\n{contenido.strip()}\n"
+
+
+def _generar_con_checkpoint(curso_id, numero, clase, perfil_estudiante, industria, al_recibir=None, refrescar=False,
+                            por_slides=False, huella=None, prefijo=None):
+    """Genera una clase y guarda el resultado (o el error) en su checkpoint."""
+    try:
+        contenido = generar_clase_con_prompt(clase, perfil_estudiante, industria, al_recibir, refrescar, por_slides,
+                                             prefijo)
+    except Exception as e:
+        if curso_id:
+            checkpoints_clases.guardar_error(curso_id, numero, str(e))
+        return f"[ERROR al generar esta clase]: {e}"
+    if curso_id:
+        checkpoints_clases.guardar_clase(curso_id, numero, contenido, huella)
+    return contenido
+
+
+def generar_contenidos_clases(clases_info: list, perfil_estudiante: str, industria: str,
+                              max_concurrentes: int = MAX_CLASES_CONCURRENTES, al_recibir=None,
+                              curso_id: str = None, reanudar: bool = True, por_slides: bool = False,
+                              datos_curso: dict = None) -> list:
+    """Genera el contenido de todas las clases en paralelo y lo devuelve en el orden de `clases_info`.
+
+    Un fallo en una clase no cancela las demás: su contenido se sustituye por un mensaje de error.
+    `al_recibir(idx, texto)` recibe el texto parcial de cada clase mientras se genera.
+    Con `por_slides`, cada clase se pide en rangos de slides concurrentes (ver `generar_clase_por_slides`).
+    Con `curso_id`, cada clase se guarda en un checkpoint; si `reanudar` es True, las clases que ya
+    se generaron bien para ese curso con el mismo prompt (ver `huella_clase`) se reutilizan y solo se
+    piden las faltantes, fallidas o modificadas. Con `reanudar=False` se generan todas de nuevo, sin
+    usar la caché de respuestas de Gemini.
+    `datos_curso` (ver `datos_del_curso`) se agrega al prefijo común junto con el temario.
+    """
+    contenidos = [None] * len(clases_info)
+    prefijo = prefijo_curso(perfil_estudiante, industria, clases_info, datos_curso)
+    previas = checkpoints_clases.obtener_clases(curso_id) if curso_id and reanudar else {}
+
+    def _callback(idx):
+        if al_recibir is None:
+            return None
+        return lambda texto: al_recibir(idx, texto)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrentes)) as executor:
+        futuros = {}
+        for idx, clase in enumerate(clases_info):
+            huella = huella_clase(clase, perfil_estudiante, industria, por_slides)
+            previa = previas.get(idx + 1)
+            if previa and previa["estado"] == checkpoints_clases.OK and previa["huella"] == huella:
+                contenidos[idx] = previa["contenido"]
+                if al_recibir is not None:
+                    al_recibir(idx, previa["contenido"])
+                continue
+            futuros[idx] = enviar_tarea(
+                executor, _generar_con_checkpoint, curso_id, idx + 1, clase, perfil_estudiante, industria,
+                _callback(idx), refrescar=not reanudar, por_slides=por_slides, huella=huella,
+                prefijo=prefijo
+            )
+        for idx, futuro in futuros.items():
+            contenidos[idx] = futuro.result()
+    return contenidos
+
+
+def repartir_en_partes(bloques: list, max_caracteres: int = MAX_CARACTERES_POR_DOCUMENTO) -> list:
+    """Agrupa bloques (numero, texto) en partes consecutivas de hasta `max_caracteres`.
+
+    Una clase que por sí sola excede el presupuesto queda en su propia parte.
+    """
+    partes, actual, tamano = [], [], 0
+    for numero, texto in bloques:
+        if actual and tamano + len(texto) > max_caracteres:
+            partes.append(actual)
+            actual, tamano = [], 0
+        actual.append((numero, texto))
+        tamano += len(texto)
+    if actual:
+        partes.append(actual)
+    return partes
+
+
+def _compartir_con_dominio(document_id: str):
+    get_drive_service().permissions().create(
+        fileId=document_id,
+        body={"type": "domain", "role": "writer", "domain": "datarebels.mx"},
+        fields="id"
+    ).execute()
+
+
+def _crear_documento(nombre: str, contenido_html: str) -> str:
+    """Guarda la copia local (si hay carpeta de exportación), sube el Doc, lo comparte y devuelve su ID."""
+    exportar_html(nombre, contenido_html)
+    document_id = subir_documento_html(nombre, contenido_html)
+    _compartir_con_dominio(document_id)
+    return document_id
+
+
+@metricas.cronometrar("documento_clases")
+def generar_documento_clases_completo(nombre_doc: str, clases_info: list, perfil_estudiante: str, industria: str,
+                                      max_concurrentes: int = MAX_CLASES_CONCURRENTES, al_recibir=None,
+                                      curso_id: str = None, reanudar: bool = True, por_slides: bool = False,
+                                      max_caracteres: int = MAX_CARACTERES_POR_DOCUMENTO, datos_curso: dict = None) -> dict:
+    """Genera las clases y las reparte en documentos de hasta `max_caracteres`, más un índice con links.
+
+    Cada documento se renderiza a HTML localmente y se crea con una sola carga a Drive.
+    Devuelve {"link_indice": ..., "partes": [{"parte", "link", "clases": [números]}]}.
+    """
+    # 🚀 Se piden todas las clases a la vez; la escritura sigue siendo en orden
+    contenidos = generar_contenidos_clases(
+        clases_info, perfil_estudiante, industria, max_concurrentes, al_recibir, curso_id, reanudar, por_slides,
+        datos_curso
+    )
+    numerados = list(enumerate(zip(clases_info, contenidos), 1))
+    bloques = [(numero, texto_clase(numero, clase, contenido)) for numero, (clase, contenido) in numerados]
+    html_clases = {numero: clase_a_html(numero, clase, contenido) for numero, (clase, contenido) in numerados}
+    partes = repartir_en_partes(bloques, max_caracteres)
+
+    # 📄 Las partes se suben y comparten a la vez
+    with ThreadPoolExecutor(max_workers=max(1, min(len(partes), MAX_DOCUMENTOS_CONCURRENTES))) as executor:
+        futuros = []
+        for idx, parte in enumerate(partes, 1):
+            nombre = f"{nombre_doc} - Parte {idx}"
+            contenido_html = documento_html(nombre, [html_clases[numero] for numero, _ in parte])
+            futuros.append(enviar_tarea(executor, _crear_documento, nombre, contenido_html))
+        ids_partes = [futuro.result() for futuro in futuros]
+
+    resultado = []
+    for idx, (parte, document_id) in enumerate(zip(partes, ids_partes), 1):
+        numeros = [numero for numero, _ in parte]
+        if curso_id:
+            checkpoints_clases.asignar_documento(curso_id, numeros, document_id)
+        resultado.append({
+            "parte": idx, "link": f"https://docs.google.com/document/d/{document_id}/edit", "clases": numeros,
+        })
+
+    nombre_indice = f"{nombre_doc} - Índice"
+    indice_id = _crear_documento(nombre_indice, documento_html(nombre_indice, [indice_a_html(nombre_doc, resultado)]))
+    return {"link_indice": f"https://docs.google.com/document/d/{indice_id}/edit", "partes": resultado}
+
+
+# =========================
+# 🔁 REGENERAR UNA SOLA CLASE
+# =========================
+_ENCABEZADO_CLASE = re.compile(r"^CLASE (\d+):")
+
+
+def _texto_parrafo(elemento: dict) -> str:
+    return "".join(
+        parte.get("textRun", {}).get("content", "") for parte in elemento.get("paragraph", {}).get("elements", [])
+    )
+
+
+def rango_clase_en_documento(document_id: str, numero: int):
+    """Rango [inicio, fin) de la clase `numero` en el documento, desde su encabezado hasta el siguiente.
+
+    Devuelve (inicio, fin, es_ultima).
+    """
+    documento = get_docs_service().documents().get(
+        documentId=document_id, fields="body(content(startIndex,endIndex,paragraph(elements(textRun(content)))))"
+    ).execute()
+    contenido = documento.get("body", {}).get("content", [])
+    inicio = fin = None
+    for elemento in contenido:
+        if "paragraph" not in elemento:
+            continue
+        encabezado = _ENCABEZADO_CLASE.match(_texto_parrafo(elemento))
+        if not encabezado:
+            continue
+        if inicio is not None:
+            fin = elemento["startIndex"]
+            break
+        if int(encabezado.group(1)) == numero:
+            inicio = elemento["startIndex"]
+    if inicio is None:
+        raise ValueError(f"No se encontró la CLASE {numero} en el documento")
+    if fin is None:
+        # El último salto de línea del cuerpo no se puede borrar
+        return inicio, contenido[-1]["endIndex"] - 1, True
+    return inicio, fin, False
+
+
+def regenerar_clase(curso_id: str, numero: int, clase_info: dict, perfil_estudiante: str, industria: str,
+                    al_recibir=None, por_slides: bool = False, clases_info: list = None,
+                    datos_curso: dict = None) -> str:
+    """Vuelve a generar una clase (sin caché) y reemplaza solo su rango en el documento existente.
+
+    Con `clases_info` (el outline completo) y `datos_curso` usa el mismo prefijo que la generación
+    del curso. Devuelve el link del documento actualizado.
+    """
+    checkpoint = checkpoints_clases.obtener_clase(curso_id, numero)
+    if not checkpoint or not checkpoint.get("documento_id"):
+        raise ValueError(f"La clase {numero} no tiene un documento asociado; genera primero las clases del curso")
+    document_id = checkpoint["documento_id"]
+
+    prefijo = prefijo_curso(perfil_estudiante, industria, clases_info or [clase_info], datos_curso)
+    contenido = generar_clase_con_prompt(clase_info, perfil_estudiante, industria, al_recibir, refrescar=True,
+                                         por_slides=por_slides, prefijo=prefijo)
+
+    inicio, fin, es_ultima = rango_clase_en_documento(document_id, numero)
+    # El rango va del encabezado hasta el siguiente encabezado; el último salto del documento no se toca.
+    # Se inserta con los mismos encabezados, viñetas y negritas que el HTML con el que se creó el documento
+    constructor = ConstructorDocumento(document_id, indice_inicial=inicio)
+    constructor.borrar_rango(inicio, fin)
+    constructor.agregar_parrafos(clase_a_parrafos(numero, clase_info, contenido), salto_final=not es_ultima)
+    constructor.ejecutar()
+
+    checkpoints_clases.guardar_clase(
+        curso_id, numero, contenido, huella_clase(clase_info, perfil_estudiante, industria, por_slides)
+    )
+    return f"https://docs.google.com/document/d/{document_id}/edit"
@@ -0,0 +1,179 @@
+"""Generación por lotes sin Streamlit.
+
+Lee un manifiesto CSV o JSONL con las columnas nombre, nivel, publico, objetivos y siguiente,
+ejecuta el pipeline completo para cada curso en paralelo y escribe un manifiesto de resultados
+con los links y los tiempos de cada etapa.
+
+Ejemplo:
+    GEMINI_API_KEY=... python generar_lote.py cursos.csv --credenciales token.json --workers 4
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from google.oauth2 import service_account
+from google.oauth2.credentials import Credentials
+
+import pool_plantillas
+
+from utils import (
+    SCOPES,
+    STUDENT_PERSONA,
+    INDUSTRIA_DEFAULT,
+    enviar_tarea,
+    usar_credenciales,
+    generar_datos_generales,
+    generar_datos_estructurados,
+    tupla_datos_generales,
+    secciones_estructuradas,
+    generar_syllabus_completo,
+    generar_outline_csv,
+)
+from generador_clases import leer_outline_desde_sheets, generar_documento_clases_completo, datos_del_curso
+
+CAMPOS_MANIFIESTO = ["nombre", "nivel", "publico", "objetivos", "siguiente"]
+
+
+def cargar_credenciales(ruta: str):
+    """Carga un token OAuth de usuario autorizado o una cuenta de servicio desde un JSON."""
+    with open(ruta, encoding="utf-8") as f:
+        info = json.load(f)
+    if info.get("type") == "service_account":
+        return service_account.Credentials.from_service_account_info(info, scopes=SCOPES)
+    return Credentials.from_authorized_user_info(info, SCOPES)
+
+
+def leer_manifiesto(ruta: str) -> list:
+    # utf-8-sig: Excel guarda los CSV con BOM, que de otro modo quedaría pegado al nombre de la primera columna
+    with open(ruta, encoding="utf-8-sig", newline="") as f:
+        if ruta.endswith(".jsonl"):
+            cursos = [json.loads(linea) for linea in f if linea.strip()]
+        else:
+            cursos = list(csv.DictReader(f))
+
+    for idx, curso in enumerate(cursos, 1):
+        if not isinstance(curso, dict):
+            raise ValueError(f"Fila {idx} del manifiesto no es un objeto JSON")
+        # En JSONL los números (p. ej. un nombre "2024") llegan como int: se pasan a texto
+        for campo in CAMPOS_MANIFIESTO:
+            valor = curso.get(campo)
+            if isinstance(valor, (dict, list)):
+                raise ValueError(f"Fila {idx} del manifiesto: '{campo}' debe ser texto, no {type(valor).__name__}")
+            if valor is not None and not isinstance(valor, str):
+                curso[campo] = str(valor)
+        faltantes = [campo for campo in ("nombre", "objetivos") if not (curso.get(campo) or "").strip()]
+        if faltantes:
+            raise ValueError(f"Fila {idx} del manifiesto sin {', '.join(faltantes)}")
+        # Las celdas vacías del CSV llegan como "": también toman el valor por defecto
+        curso["nivel"] = curso.get("nivel") or "básico"
+        curso["publico"] = curso.get("publico") or ""
+        curso["siguiente"] = curso.get("siguiente") or "N/A"
+    return cursos
+
+
+def procesar_curso(curso: dict, generar_clases: bool = True, clases_concurrentes: int = 6,
+                   estructurado: bool = False, por_slides: bool = False) -> dict:
+    """Ejecuta el pipeline de un curso y devuelve su fila de resultados."""
+    resultado = {"nombre": curso["nombre"], "estado": "ok", "tiempos": {}}
+    tiempos = resultado["tiempos"]
+    inicio_curso = time.perf_counter()
+
+    def etapa(nombre, fn, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            tiempos[nombre] = round(time.perf_counter() - inicio, 3)
+
+    try:
+        argumentos = (curso["nombre"], curso["nivel"], curso["publico"], STUDENT_PERSONA, curso["siguiente"], curso["objetivos"])
+        secciones = None
+        if estructurado:
+            datos = etapa("datos_generales", generar_datos_estructurados, *argumentos)
+            datos_generales = tupla_datos_generales(datos)
+            secciones = secciones_estructuradas(datos)
+        else:
+            datos_generales = etapa("datos_generales", generar_datos_generales, *argumentos)
+        perfil_ingreso, objetivos_mejorados, perfil_egreso, outline, \
+        titulo1, desc1, titulo2, desc2, titulo3, desc3 = datos_generales
+
+        resultado["link_syllabus"] = etapa(
+            "syllabus", generar_syllabus_completo,
+            curso["nombre"], curso["nivel"], objetivos_mejorados, curso["publico"], curso["siguiente"],
+            perfil_ingreso, perfil_egreso, outline,
+            titulo1, desc1, titulo2, desc2, titulo3, desc3,
+            secciones=secciones
+        )
+
+        resultado["link_outline"] = etapa(
+            "outline", generar_outline_csv,
+            curso["nombre"], curso["nivel"], objetivos_mejorados, perfil_ingreso, curso["siguiente"], outline
+        )
+
+        if generar_clases:
+            # Recién creada: nadie pudo editarla, así que no hace falta verificar su modifiedTime
+            clases_info = etapa("leer_outline", leer_outline_desde_sheets, resultado["link_outline"], verificar=False)
+            resultado["documentos_clases"] = etapa(
+                "clases", generar_documento_clases_completo,
+                nombre_doc=f"Clases - {curso['nombre']}",
+                clases_info=clases_info,
+                perfil_estudiante=STUDENT_PERSONA,
+                industria=INDUSTRIA_DEFAULT,
+                max_concurrentes=clases_concurrentes,
+                por_slides=por_slides,
+                datos_curso=datos_del_curso(curso["nombre"], curso["nivel"], curso["publico"], datos_generales)
+            )
+    except Exception as e:
+        resultado["estado"] = "error"
+        resultado["error"] = f"{type(e).__name__}: {e}"
+
+    tiempos["total"] = round(time.perf_counter() - inicio_curso, 3)
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera syllabus, outline y clases para un catálogo de cursos.")
+    parser.add_argument("manifiesto", help="CSV o JSONL con columnas: " + ", ".join(CAMPOS_MANIFIESTO))
+    parser.add_argument("--credenciales", required=True,
+                        help="JSON de usuario autorizado (token OAuth) o de cuenta de servicio")
+    parser.add_argument("--salida", default="resultados.jsonl", help="Manifiesto de resultados (JSONL)")
+    parser.add_argument("--workers", type=int, default=4, help="Cursos procesados en paralelo")
+    parser.add_argument("--clases-concurrentes", type=int, default=6, help="Clases generadas en paralelo por curso")
+    parser.add_argument("--sin-clases", action="store_true", help="Solo genera syllabus y outline")
+    parser.add_argument("--estructurado", action="store_true",
+                        help="Pide datos, secciones y outline en una sola llamada con salida JSON")
+    parser.add_argument("--por-slides", action="store_true",
+                        help="Genera cada clase en rangos de slides concurrentes")
+    args = parser.parse_args(argv)
+
+    # Un lote es una sola corrida: el pool solo dejaría copias sin reclamar al terminar
+    pool_plantillas.POOL_TAMANO = 0
+
+    cursos = leer_manifiesto(args.manifiesto)
+    creds = cargar_credenciales(args.credenciales)
+    errores = 0
+
+    with usar_credenciales(creds), open(args.salida, "w", encoding="utf-8") as salida, \
+            ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futuros = {
+            enviar_tarea(executor, procesar_curso, curso, not args.sin_clases, args.clases_concurrentes,
+                         args.estructurado, args.por_slides): curso
+            for curso in cursos
+        }
+        for futuro in as_completed(futuros):
+            resultado = futuro.result()
+            # Se escribe cada curso al terminar para no perder el avance si el lote se interrumpe
+            salida.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+            salida.flush()
+            errores += resultado["estado"] != "ok"
+            print(f"[{resultado['estado']}] {resultado['nombre']} ({resultado['tiempos']['total']} s)", file=sys.stderr)
+
+    print(f"{len(cursos) - errores}/{len(cursos)} cursos generados. Resultados en {args.salida}", file=sys.stderr)
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# =========================
+# 📈 MÉTRICAS DEL PROCESO
+# =========================
+# Contadores e histogramas en memoria, exportables en formato Prometheus o como JSON.
+BUCKETS_SEGUNDOS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80, 160, float("inf"))
+
+_lock = threading.Lock()
+_contadores = {}    # (nombre, etiquetas) -> valor
+_histogramas = {}   # (nombre, etiquetas) -> {"buckets": [...], "suma": float, "cuenta": int}
+
+
+def _etiquetas(etiquetas: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in etiquetas.items()))
+
+
+def incrementar(nombre: str, valor: float = 1, **etiquetas):
+    clave = (nombre, _etiquetas(etiquetas))
+    with _lock:
+        _contadores[clave] = _contadores.get(clave, 0) + valor
+
+
+def observar(nombre: str, valor: float, **etiquetas):
+    clave = (nombre, _etiquetas(etiquetas))
+    with _lock:
+        histograma = _histogramas.get(clave)
+        if histograma is None:
+            histograma = _histogramas[clave] = {"buckets": [0] * len(BUCKETS_SEGUNDOS), "suma": 0.0, "cuenta": 0}
+        for i, limite in enumerate(BUCKETS_SEGUNDOS):
+            if valor <= limite:
+                histograma["buckets"][i] += 1
+        histograma["suma"] += valor
+        histograma["cuenta"] += 1
+
+
+@contextmanager
+def medir(nombre: str, **etiquetas):
+    """Registra la duración del bloque en el histograma `nombre` (segundos)."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar(nombre, time.perf_counter() - inicio, **etiquetas)
+
+
+def cronometrar(etapa: str):
+    """Decorador que mide cada ejecución de una etapa del pipeline."""
+    def decorador(fn):
+        @functools.wraps(fn)
+        def envoltura(*args, **kwargs):
+            with medir("etapa_duracion_segundos", etapa=etapa):
+                return fn(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def reiniciar():
+    with _lock:
+        _contadores.clear()
+        _histogramas.clear()
+
+
+# === Exportación ===
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formatear_etiquetas(etiquetas: tuple, extra: tuple = ()) -> str:
+    pares = list(etiquetas) + list(extra)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares) + "}"
+
+
+def exportar_prometheus() -> str:
+    with _lock:
+        contadores = dict(_contadores)
+        histogramas = {clave: {**h, "buckets": list(h["buckets"])} for clave, h in _histogramas.items()}
+
+    lineas = []
+    for nombre in sorted({n for n, _ in contadores}):
+        lineas.append(f"# TYPE {nombre} counter")
+        for (n, etiquetas), valor in sorted(contadores.items()):
+            if n == nombre:
+                lineas.append(f"{nombre}{_formatear_etiquetas(etiquetas)} {valor}")
+    for nombre in sorted({n for n, _ in histogramas}):
+        lineas.append(f"# TYPE {nombre} histogram")
+        for (n, etiquetas), h in sorted(histogramas.items()):
+            if n != nombre:
+                continue
+            for limite, cuenta in zip(BUCKETS_SEGUNDOS, h["buckets"]):
+                le = "+Inf" if limite == float("inf") else repr(limite)
+                lineas.append(f"{nombre}_bucket{_formatear_etiquetas(etiquetas, (('le', le),))} {cuenta}")
+            lineas.append(f"{nombre}_sum{_formatear_etiquetas(etiquetas)} {h['suma']}")
+            lineas.append(f"{nombre}_count{_formatear_etiquetas(etiquetas)} {h['cuenta']}")
+    return "\n".join(lineas) + "\n"
+
+
+def exportar_json() -> dict:
+    with _lock:
+        return {
+            "contadores": [
+                {"nombre": n, "etiquetas": dict(e), "valor": v} for (n, e), v in sorted(_contadores.items())
+            ],
+            "histogramas": [
+                {
+                    "nombre": n, "etiquetas": dict(e), "cuenta": h["cuenta"], "suma": round(h["suma"], 4),
+                    "promedio": round(h["suma"] / h["cuenta"], 4) if h["cuenta"] else 0.0,
+                }
+                for (n, e), h in sorted(_histogramas.items())
+            ],
+        }
+
+
+class _ManejadorMetricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        cuerpo = exportar_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def servir_prometheus(puerto: int, host: str = "0.0.0.0"):
+    """Expone /metrics en un hilo daemon para que Prometheus lo consulte."""
+    servidor = ThreadingHTTPServer((host, puerto), _ManejadorMetricas)
+    threading.Thread(target=servidor.serve_forever, name="metricas-http", daemon=True).start()
+    return servidor
@@ -0,0 +1,291 @@
+import atexit
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime
+
+import metricas
+
+# =========================
+# 🧊 POOL DE DOCUMENTOS PRE-CREADOS
+# =========================
+# Copias de la plantilla del syllabus y hojas vacías para el outline, ya compartidas con el dominio,
+# esperan en una carpeta de staging. Cada corrida reclama una (renombrar + mover, una sola llamada)
+# en lugar de copiar/crear y compartir; el pool se rellena en segundo plano.
+# Solo conviene en procesos de larga vida (la app); por eso está desactivado salvo que se configure.
+POOL_TAMANO = int(os.environ.get("POOL_PLANTILLAS_TAMANO", 0))  # Elementos por tipo y credencial; 0 = sin pool
+POOL_MAX_EDAD = float(os.environ.get("POOL_PLANTILLAS_MAX_EDAD_HORAS", 12)) * 3600
+POOL_INTERVALO_GC = 10 * 60
+# Cada proceso solo reclama lo que creó, para que dos procesos nunca entreguen el mismo archivo.
+# Con un valor fijo, un proceso reiniciado retoma los elementos que dejó en staging.
+POOL_INSTANCIA_FIJA = bool(os.environ.get("POOL_PLANTILLAS_INSTANCIA"))
+POOL_INSTANCIA = os.environ.get("POOL_PLANTILLAS_INSTANCIA") or uuid.uuid4().hex
+CARPETA_STAGING = "Pool - Generador de Syllabus"
+
+SYLLABUS = "syllabus"
+OUTLINE = "outline"
+MIME_HOJA = "application/vnd.google-apps.spreadsheet"
+MIME_CARPETA = "application/vnd.google-apps.folder"
+
+_colas = {}         # (clave de credencial, tipo) -> deque de (file_id, creado en epoch, versión de la plantilla)
+_rellenando = {}    # (clave de credencial, tipo) -> Future del relleno en curso
+_estado = {}        # clave de credencial -> {"carpeta", "padres_plantilla", "version_plantilla", "ultimo_gc"}
+_credenciales = {}  # clave de credencial -> credenciales, para vaciar el pool al salir
+_lock = threading.Lock()
+_preparando = threading.Lock()  # Los rellenos de ambos tipos no deben crear dos carpetas de staging
+_cerrando = threading.Event()
+
+
+def _en_segundo_plano(fn, *args) -> Future:
+    """Ejecuta `fn` en un hilo daemon: un relleno en curso no debe retrasar la salida del proceso."""
+    futuro = Future()
+
+    def correr():
+        try:
+            futuro.set_result(fn(*args))
+        except BaseException as e:
+            futuro.set_exception(e)
+
+    threading.Thread(target=correr, name="pool-plantillas", daemon=True).start()
+    return futuro
+
+
+def _compartir(file_id: str):
+    from utils import get_drive_service
+    get_drive_service().permissions().create(
+        fileId=file_id,
+        body={"type": "domain", "role": "writer", "domain": "datarebels.mx", "allowFileDiscovery": True},
+        fields="id"
+    ).execute()
+
+
+def _preparar(clave) -> dict:
+    """Carpeta de staging y datos de la plantilla de la credencial (se consultan una vez por proceso)."""
+    from utils import get_drive_service, TEMPLATE_ID
+    with _preparando:
+        with _lock:
+            estado = _estado.get(clave)
+        if estado is None:
+            estado = _cargar_estado(clave, get_drive_service(), TEMPLATE_ID)
+        return estado
+
+
+def _cargar_estado(clave, drive, template_id: str) -> dict:
+    encontradas = drive.files().list(
+        q=f"mimeType='{MIME_CARPETA}' and appProperties has {{key='pool_staging' and value='1'}} and trashed=false",
+        fields="files(id)", pageSize=1
+    ).execute().get("files", [])
+    if encontradas:
+        carpeta = encontradas[0]["id"]
+    else:
+        carpeta = drive.files().create(
+            body={"name": CARPETA_STAGING, "mimeType": MIME_CARPETA, "appProperties": {"pool_staging": "1"}},
+            fields="id"
+        ).execute()["id"]
+
+    # Al reclamar, la copia se mueve a donde la habría dejado files().copy: la carpeta de la plantilla.
+    # La versión se vuelve a consultar en cada relleno y al reclamar (ver `_comprobar_version`)
+    plantilla = drive.files().get(fileId=template_id, fields="parents,version").execute()
+    estado = {
+        "carpeta": carpeta,
+        "padres_plantilla": plantilla.get("parents") or ["root"],
+        "version_plantilla": str(plantilla.get("version", "")),
+        "ultimo_gc": 0.0,
+    }
+    with _lock:
+        _estado[clave] = estado
+    return estado
+
+
+def _comprobar_version(estado: dict) -> str:
+    """Lee la versión actual de la plantilla; si cambió, adelanta la recolección de las copias viejas."""
+    from utils import get_drive_service, TEMPLATE_ID
+    version = str(get_drive_service().files().get(fileId=TEMPLATE_ID, fields="version").execute().get("version", ""))
+    with _lock:
+        if version != estado["version_plantilla"]:
+            estado["version_plantilla"] = version
+            estado["ultimo_gc"] = 0.0
+    return version
+
+
+def _crear_elemento(tipo: str, estado: dict) -> str:
+    from utils import get_drive_service, TEMPLATE_ID
+    propiedades = {"pool_tipo": tipo, "pool_instancia": POOL_INSTANCIA}
+    if tipo == SYLLABUS:
+        propiedades["plantilla_version"] = estado["version_plantilla"]
+        archivo = get_drive_service().files().copy(
+            fileId=TEMPLATE_ID,
+            body={"name": "[pool] Syllabus", "parents": [estado["carpeta"]], "appProperties": propiedades},
+            fields="id"
+        ).execute()
+    else:
+        archivo = get_drive_service().files().create(
+            body={"name": "[pool] Outline", "mimeType": MIME_HOJA, "parents": [estado["carpeta"]],
+                  "appProperties": propiedades},
+            fields="id"
+        ).execute()
+    _compartir(archivo["id"])
+    metricas.incrementar("pool_plantillas_total", tipo=tipo, resultado="creado")
+    return archivo["id"]
+
+
+def _edad(creado: str) -> float:
+    return time.time() - datetime.fromisoformat(creado.replace("Z", "+00:00")).timestamp()
+
+
+def _recolectar(clave, estado: dict):
+    """Borra los elementos viejos o de una versión anterior de la plantilla y recupera los propios."""
+    from utils import get_drive_service
+    drive = get_drive_service()
+    respuesta = drive.files().list(
+        q=f"'{estado['carpeta']}' in parents and trashed=false",
+        fields="files(id,createdTime,appProperties)", pageSize=1000
+    ).execute()
+    with _lock:
+        # Las copias de una versión anterior salen de la cola; el recorrido de abajo las borra de Drive
+        cola = _colas.get((clave, SYLLABUS))
+        if cola:
+            _colas[(clave, SYLLABUS)] = deque(e for e in cola if e[2] == estado["version_plantilla"])
+        en_cola = {e[0] for tipo in (SYLLABUS, OUTLINE) for e in _colas.get((clave, tipo), ())}
+    for archivo in respuesta.get("files", []):
+        propiedades = archivo.get("appProperties", {})
+        tipo = propiedades.get("pool_tipo")
+        obsoleto = tipo == SYLLABUS and propiedades.get("plantilla_version") != estado["version_plantilla"]
+        if _edad(archivo["createdTime"]) > POOL_MAX_EDAD or obsoleto or tipo not in (SYLLABUS, OUTLINE):
+            drive.files().delete(fileId=archivo["id"]).execute()
+            metricas.incrementar("pool_plantillas_total", tipo=tipo or "desconocido", resultado="recolectado")
+        elif propiedades.get("pool_instancia") == POOL_INSTANCIA and archivo["id"] not in en_cola:
+            with _lock:
+                _colas.setdefault((clave, tipo), deque()).append(
+                    (archivo["id"], time.time() - _edad(archivo["createdTime"]), propiedades.get("plantilla_version"))
+                )
+
+
+def _rellenar(clave, tipo: str, creds):
+    from utils import usar_credenciales
+    try:
+        with usar_credenciales(creds):
+            estado = _preparar(clave)
+            if tipo == SYLLABUS:
+                _comprobar_version(estado)
+            with _lock:
+                # Los rellenos de ambos tipos corren a la vez: solo uno hace la recolección
+                recolectar = time.monotonic() - estado["ultimo_gc"] > POOL_INTERVALO_GC
+                if recolectar:
+                    estado["ultimo_gc"] = time.monotonic()
+            if recolectar:
+                _recolectar(clave, estado)
+            while len(_colas.get((clave, tipo), ())) < POOL_TAMANO and not _cerrando.is_set():
+                version = estado["version_plantilla"] if tipo == SYLLABUS else None
+                file_id = _crear_elemento(tipo, estado)
+                with _lock:
+                    _colas.setdefault((clave, tipo), deque()).append((file_id, time.time(), version))
+    except Exception:
+        # El pool es solo una optimización: si falla, las corridas crean sus archivos como siempre
+        traceback.print_exc()
+    finally:
+        with _lock:
+            _rellenando.pop((clave, tipo), None)
+
+
+def programar_relleno(tipo: str, creds=None):
+    """Rellena en segundo plano el pool de `tipo` para la credencial. Devuelve el Future (o None)."""
+    from utils import credenciales_actuales, clave_credenciales
+    if POOL_TAMANO <= 0 or _cerrando.is_set():
+        return None
+    creds = creds if creds is not None else credenciales_actuales()
+    clave = (clave_credenciales(creds), tipo)
+    with _lock:
+        _credenciales[clave[0]] = creds
+        if clave in _rellenando:
+            return _rellenando[clave]
+        futuro = _en_segundo_plano(_rellenar, clave[0], tipo, creds)
+        _rellenando[clave] = futuro
+        return futuro
+
+
+def calentar(creds=None) -> list:
+    """Programa el relleno de ambos tipos (p. ej. al iniciar sesión). Devuelve los Futures."""
+    return [f for f in (programar_relleno(SYLLABUS, creds), programar_relleno(OUTLINE, creds)) if f is not None]
+
+
+def reclamar(tipo: str, nombre: str):
+    """Toma un elemento del pool, lo renombra a `nombre` y lo saca de staging. Devuelve su ID o None.
+
+    Para el syllabus se consulta antes la versión de la plantilla (una llamada de metadatos) y se
+    descartan las copias hechas de una versión anterior.
+    """
+    from utils import get_drive_service, credenciales_actuales, clave_credenciales
+    if POOL_TAMANO <= 0:
+        return None
+    creds = credenciales_actuales()
+    clave = clave_credenciales(creds)
+    try:
+        with _lock:
+            estado = _estado.get(clave)
+            hay_elementos = bool(_colas.get((clave, tipo)))
+        if not hay_elementos:
+            metricas.incrementar("pool_plantillas_total", tipo=tipo, resultado="vacio")
+            return None
+        try:
+            version = _comprobar_version(estado) if tipo == SYLLABUS else None
+        except Exception:
+            traceback.print_exc()
+            return None
+        while True:
+            with _lock:
+                cola = _colas.get((clave, tipo))
+                if not cola:
+                    metricas.incrementar("pool_plantillas_total", tipo=tipo, resultado="vacio")
+                    return None
+                file_id, creado, version_elemento = cola.popleft()
+            if time.time() - creado > POOL_MAX_EDAD or version_elemento != version:
+                metricas.incrementar("pool_plantillas_total", tipo=tipo, resultado="descartado")
+                continue  # El GC lo borrará
+            destino = estado["padres_plantilla"] if tipo == SYLLABUS else ["root"]
+            try:
+                get_drive_service().files().update(
+                    fileId=file_id,
+                    body={"name": nombre, "appProperties": {"pool_tipo": None, "pool_instancia": None,
+                                                            "plantilla_version": None}},
+                    addParents=",".join(destino),
+                    removeParents=estado["carpeta"],
+                    fields="id"
+                ).execute()
+            except Exception:
+                # Borrado por otro proceso o a mano: se intenta con el siguiente
+                traceback.print_exc()
+                continue
+            metricas.incrementar("pool_plantillas_total", tipo=tipo, resultado="reclamado")
+            return file_id
+    finally:
+        programar_relleno(tipo, creds)
+
+
+@atexit.register
+def vaciar():
+    """Borra de Drive los elementos que este proceso tiene en cola y detiene los rellenos.
+
+    Se ejecuta al salir: otro proceso no puede reclamarlos (están marcados con esta instancia) y,
+    de quedarse, seguirían compartidos en staging hasta la recolección de otro proceso. Con una
+    instancia fija se conservan, porque el proceso reiniciado los retoma.
+    """
+    from utils import get_drive_service, usar_credenciales
+    _cerrando.set()
+    if POOL_INSTANCIA_FIJA:
+        return
+    with _lock:
+        pendientes = {clave: list(cola) for clave, cola in _colas.items() if cola}
+        _colas.clear()
+    for (clave, tipo), elementos in pendientes.items():
+        with usar_credenciales(_credenciales[clave]):
+            for file_id, _, _ in elementos:
+                try:
+                    get_drive_service().files().delete(fileId=file_id).execute()
+                    metricas.incrementar("pool_plantillas_total", tipo=tipo, resultado="vaciado")
+                except Exception:
+                    traceback.print_exc()
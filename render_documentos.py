@@ -0,0 +1,205 @@
+import html
+import os
+import re
+
+# =========================
+# 🖨️ RENDER LOCAL DE DOCUMENTOS (HTML)
+# =========================
+# El contenido generado se convierte a HTML en memoria: Drive lo importa como Google Doc en una sola
+# carga (encabezados y slides incluidos) y el mismo HTML sirve como exportación offline.
+# Carpeta para guardar una copia local de cada documento; vacío = no se escribe nada en disco
+EXPORTACION_DIR = os.environ.get("EXPORTACION_DIR", "")
+
+_SLIDE = re.compile(r"^[#*\s]*slide\s+(\d+)\s*(?:[:.)\-–—]\s*(.*?))?[*\s]*$", re.IGNORECASE)
+_ENCABEZADO = re.compile(r"^(#{1,6})\s+(.*?)\s*#*$")
+_VINETA = re.compile(r"^[-*•]\s+(.*)$")
+_NUMERADA = re.compile(r"^\d+[.)]\s+(.*)$")
+_SEPARADOR = re.compile(r"^([-*_])(\s*\1){2,}$")
+_NEGRITA = re.compile(r"\*\*(.+?)\*\*")
+_CURSIVA = re.compile(r"(?<![*\w])\*(?![\s*])(.+?)(?<![\s*])\*(?![*\w])")
+_LINK_MD = re.compile(r"\[([^\]]+)\]\((https?://[^\s)]+)\)")
+_URL = re.compile(r"https?://[^\s<>()\[\]*\"']+")
+_NOMBRE_ARCHIVO = re.compile(r"[^\w\- ]+")
+
+
+def _formato(texto: str, enlazar: bool = True) -> str:
+    texto = html.escape(texto, quote=False)
+    if enlazar:
+        def _link(m):
+            url = m.group(0).rstrip(".,;:")
+            return f'<a href="{url}">{url}</a>{m.group(0)[len(url):]}'
+        texto = _URL.sub(_link, texto)
+    texto = _NEGRITA.sub(r"<b>\1</b>", texto)
+    return _CURSIVA.sub(r"<i>\1</i>", texto)
+
+
+def _en_linea(texto: str) -> str:
+    """Negritas, cursivas y links (Markdown o URLs sueltas) de una línea."""
+    partes, posicion = [], 0
+    for m in _LINK_MD.finditer(texto):
+        partes.append(_formato(texto[posicion:m.start()]))
+        partes.append(f'<a href="{html.escape(m.group(2))}">{_formato(m.group(1), enlazar=False)}</a>')
+        posicion = m.end()
+    partes.append(_formato(texto[posicion:]))
+    return "".join(partes)
+
+
+def bloques_markdown(texto: str) -> list:
+    """Divide el Markdown que devuelve Gemini en bloques, con el formato en línea aún sin convertir.
+
+    Cada bloque es ("h", nivel, texto), ("p", líneas) o ("ul"/"ol", elementos). Cada "SLIDE n: título"
+    es un encabezado de nivel 2 y los encabezados Markdown empiezan en el nivel 3, para que el nivel 1
+    quede reservado al título de la clase.
+    """
+    bloques, parrafo, lista = [], [], None  # lista = (etiqueta, elementos)
+
+    def cerrar():
+        nonlocal lista
+        if parrafo:
+            bloques.append(("p", list(parrafo)))
+            parrafo.clear()
+        if lista:
+            bloques.append(lista)
+            lista = None
+
+    def agregar_a_lista(etiqueta, elemento):
+        nonlocal lista
+        if parrafo or (lista and lista[0] != etiqueta):
+            cerrar()
+        if lista is None:
+            lista = (etiqueta, [])
+        lista[1].append(elemento)
+
+    for linea in texto.splitlines():
+        limpia = linea.strip()
+        if not limpia or _SEPARADOR.match(limpia):
+            cerrar()
+            continue
+        slide = _SLIDE.match(limpia)
+        encabezado = _ENCABEZADO.match(limpia)
+        if slide:
+            cerrar()
+            titulo = f"Slide {slide.group(1)}" + (f": {slide.group(2).strip('*: ')}" if slide.group(2) else "")
+            bloques.append(("h", 2, titulo))
+        elif encabezado:
+            cerrar()
+            bloques.append(("h", min(len(encabezado.group(1)) + 2, 6), encabezado.group(2)))
+        elif _VINETA.match(limpia):
+            agregar_a_lista("ul", _VINETA.match(limpia).group(1))
+        elif _NUMERADA.match(limpia):
+            agregar_a_lista("ol", _NUMERADA.match(limpia).group(1))
+        else:
+            if lista:
+                cerrar()
+            parrafo.append(limpia)
+    cerrar()
+    return bloques
+
+
+def markdown_a_html(texto: str) -> str:
+    """Convierte el Markdown que devuelve Gemini a HTML (ver `bloques_markdown`)."""
+    salida = []
+    for bloque in bloques_markdown(texto):
+        if bloque[0] == "h":
+            salida.append(f"<h{bloque[1]}>{_en_linea(bloque[2])}</h{bloque[1]}>")
+        elif bloque[0] == "p":
+            salida.append(f"<p>{'<br>'.join(_en_linea(linea) for linea in bloque[1])}</p>")
+        else:
+            etiqueta, elementos = bloque
+            salida.append(f"<{etiqueta}>{''.join(f'<li>{_en_linea(e)}</li>' for e in elementos)}</{etiqueta}>")
+    return "\n".join(salida)
+
+
+# === Mismo contenido como párrafos de Google Docs ===
+# Para editar un documento ya creado (regenerar una clase) no se puede subir HTML: se insertan
+# párrafos con su estilo con nombre, viñetas y estilos de texto vía batchUpdate.
+_ESTILO_NIVEL = {nivel: f"HEADING_{nivel}" for nivel in range(1, 7)}
+
+
+def _tramos(texto: str, estilo: dict, reglas: list) -> list:
+    if not reglas:
+        return [(texto, estilo)] if texto else []
+    patron, extra = reglas[0]
+    tramos, posicion = [], 0
+    for m in patron.finditer(texto):
+        tramos += _tramos(texto[posicion:m.start()], estilo, reglas[1:])
+        if extra is None:
+            # URL suelta: la puntuación final no forma parte del link
+            url = m.group(0).rstrip(".,;:")
+            tramos.append((url, {**estilo, "link": {"url": url}}))
+            tramos += _tramos(m.group(0)[len(url):], estilo, [])
+        else:
+            tramos += _tramos(m.group(1), {**estilo, **extra}, reglas[1:])
+        posicion = m.end()
+    return tramos + _tramos(texto[posicion:], estilo, reglas[1:])
+
+
+def tramos_en_linea(texto: str) -> list:
+    """Texto plano de una línea en tramos (texto, estilo de texto de Docs) con negritas, cursivas y links."""
+    formato = [(_NEGRITA, {"bold": True}), (_CURSIVA, {"italic": True})]
+    tramos, posicion = [], 0
+    for m in _LINK_MD.finditer(texto):
+        tramos += _tramos(texto[posicion:m.start()], {}, formato + [(_URL, None)])
+        tramos += _tramos(m.group(1), {"link": {"url": m.group(2)}}, formato)
+        posicion = m.end()
+    return tramos + _tramos(texto[posicion:], {}, formato + [(_URL, None)])
+
+
+def markdown_a_parrafos(texto: str) -> list:
+    """Convierte el Markdown de Gemini a párrafos de Docs: {"tramos", "estilo", "lista"}.
+
+    Los niveles de encabezado son los mismos que en `markdown_a_html` (HEADING_2 para cada slide).
+    """
+    parrafos = []
+    for bloque in bloques_markdown(texto):
+        if bloque[0] == "h":
+            parrafos.append({"tramos": tramos_en_linea(bloque[2]), "estilo": _ESTILO_NIVEL[bloque[1]], "lista": None})
+        elif bloque[0] == "p":
+            parrafos += [{"tramos": tramos_en_linea(linea), "estilo": "NORMAL_TEXT", "lista": None} for linea in bloque[1]]
+        else:
+            etiqueta, elementos = bloque
+            parrafos += [{"tramos": tramos_en_linea(e), "estilo": "NORMAL_TEXT", "lista": etiqueta} for e in elementos]
+    return parrafos
+
+
+def clase_a_html(numero: int, clase: dict, contenido: str) -> str:
+    # El encabezado conserva el texto "CLASE n:" con el que se ubica la clase al regenerarla
+    encabezado = html.escape(f"CLASE {numero}: {clase['titulo']}", quote=False)
+    return f"<h1>{encabezado}</h1>\n{markdown_a_html(contenido)}"
+
+
+def clase_a_parrafos(numero: int, clase: dict, contenido: str) -> list:
+    """Como `clase_a_html`, en párrafos de Docs (ver `markdown_a_parrafos`)."""
+    encabezado = {"tramos": [(f"CLASE {numero}: {clase['titulo']}", {})], "estilo": "HEADING_1", "lista": None}
+    return [encabezado] + markdown_a_parrafos(contenido)
+
+
+def indice_a_html(titulo: str, partes: list) -> str:
+    elementos = []
+    for parte in partes:
+        desde, hasta = parte["clases"][0], parte["clases"][-1]
+        clases = f"Clase {desde}" if desde == hasta else f"Clases {desde} a {hasta}"
+        elementos.append(f'<li><a href="{html.escape(parte["link"])}">Parte {parte["parte"]}: {clases}</a></li>')
+    return f"<h1>{html.escape(titulo, quote=False)}</h1>\n<ul>{''.join(elementos)}</ul>"
+
+
+def documento_html(titulo: str, cuerpos: list) -> str:
+    """Documento HTML completo a partir de los fragmentos de `cuerpos`."""
+    return (
+        '<!DOCTYPE html>\n<html><head><meta charset="utf-8">'
+        f"<title>{html.escape(titulo, quote=False)}</title></head>\n<body>\n"
+        + "\n".join(cuerpos)
+        + "\n</body></html>\n"
+    )
+
+
+def exportar_html(titulo: str, contenido_html: str, directorio: str = None):
+    """Guarda `contenido_html` en `directorio` (o EXPORTACION_DIR). Devuelve la ruta, o None si no hay carpeta."""
+    directorio = directorio or EXPORTACION_DIR
+    if not directorio:
+        return None
+    os.makedirs(directorio, exist_ok=True)
+    ruta = os.path.join(directorio, f"{_NOMBRE_ARCHIVO.sub('_', titulo).strip() or 'documento'}.html")
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write(contenido_html)
+    return ruta
@@ -0,0 +1,103 @@
+import re
+
+# =========================
+# 📋 PARSER DE TABLAS MARKDOWN (SIN PANDAS)
+# =========================
+# Convierte el outline que devuelve el LLM en filas en una sola pasada, línea por línea.
+_SEPARADOR = re.compile(r"^\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$")
+_ESPACIOS = re.compile(r"[\r\n\t]+")
+
+
+def dividir_celdas(linea: str) -> list:
+    """Divide una fila `| a | b |` en celdas. `\\|` se respeta como pipe literal dentro de una celda."""
+    linea = linea.strip()
+    celdas, actual, escapado = [], [], False
+    for caracter in linea:
+        if escapado:
+            actual.append(caracter if caracter == "|" else "\\" + caracter)
+            escapado = False
+        elif caracter == "\\":
+            escapado = True
+        elif caracter == "|":
+            celdas.append("".join(actual))
+            actual = []
+        else:
+            actual.append(caracter)
+    if escapado:
+        actual.append("\\")
+    celdas.append("".join(actual))
+
+    # Los pipes de los extremos dejan celdas vacías al inicio y al final
+    if linea.startswith("|"):
+        celdas = celdas[1:]
+    if linea.endswith("|") and not linea.endswith("\\|"):
+        celdas = celdas[:-1]
+    return [_ESPACIOS.sub(" ", celda).strip() for celda in celdas]
+
+
+def iterar_filas(lineas):
+    """Genera las filas de la primera tabla encontrada en `lineas` (texto o iterable de líneas).
+
+    La primera fila es el encabezado. Las filas separadoras (`|---|`, `|-|:-:|`), las líneas en
+    blanco y el texto antes de la tabla se ignoran. La tabla termina en la primera línea con texto
+    que no es una fila (sin pipes o, si la tabla usa pipes en los bordes, que no empieza con uno):
+    el texto posterior no se convierte en filas aunque contenga un pipe. Las filas con menos celdas se completan con "" y las que tienen de más
+    juntan el excedente en la última columna.
+
+    >>> list(iterar_filas("Outline:\\n| A | B |\\n|---|---|\\n| 1 | 2 |\\nNotas: algo | con pipe\\n| 3 | 4 |"))
+    [['A', 'B'], ['1', '2']]
+    >>> list(iterar_filas("| A | B |\\n|-|:-:|\\n| 1 | 2 |\\n\\n| 3 | 4 |"))
+    [['A', 'B'], ['1', '2'], ['3', '4']]
+    """
+    if isinstance(lineas, str):
+        lineas = lineas.splitlines()
+    ancho = None
+    bordes = False
+    for linea in lineas:
+        limpia = linea.strip()
+        if not limpia or _SEPARADOR.match(limpia):
+            continue
+        es_fila = "|" in limpia and (limpia.startswith("|") or not bordes)
+        if not es_fila:
+            if ancho is not None:
+                return
+            continue
+        celdas = dividir_celdas(linea)
+        if not any(celdas):
+            continue
+        if ancho is None:
+            ancho = len(celdas)
+            bordes = limpia.startswith("|")
+        elif len(celdas) < ancho:
+            celdas = celdas + [""] * (ancho - len(celdas))
+        elif len(celdas) > ancho:
+            celdas = celdas[:ancho - 1] + [" | ".join(celdas[ancho - 1:])]
+        yield celdas
+
+
+def parsear_tabla(texto: str):
+    """Devuelve (encabezados, filas) de la tabla Markdown contenida en `texto`."""
+    filas = list(iterar_filas(texto))
+    if not filas:
+        raise ValueError("No se encontró una tabla Markdown en el outline")
+    return filas[0], filas[1:]
+
+
+def fila_a_clase(fila: list):
+    """Registro de clase a partir de una fila del outline (Clase, Título, Conceptos, Obj 1-3, Descripción).
+
+    Devuelve None si la fila no tiene las 7 columnas.
+    """
+    if len(fila) < 7:
+        return None
+    return {
+        "numero": fila[0],
+        "titulo": fila[1],
+        "conceptos": fila[2],
+        "objetivos": [fila[3], fila[4], fila[5]],
+        "descripcion": fila[6],
+    }
+
+
+def clases_desde_filas(filas: list) -> list:
+    return [clase for clase in map(fila_a_clase, filas) if clase is not None]
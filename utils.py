@@ -1,12 +1,31 @@
 import streamlit as st
-import json
-import pandas as pd
+import base64
 import io
+import json
+import os
 import re
-import requests
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from googleapiclient.discovery import build
+from googleapiclient.http import HttpRequest, MediaIoBaseUpload
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
+from google.auth.transport.requests import Request as GoogleAuthRequest
 from google_auth_oauthlib.flow import Flow
 from google.oauth2.credentials import Credentials
+from cache_llm import clave_cache, obtener_cache
+from tabla_markdown import parsear_tabla
+from cliente_gemini import CODIGOS_REINTENTABLES, estimar_tokens, post_gemini
+from contexto_gemini import obtener_contexto, invalidar_contexto
+import metricas
+import pool_plantillas
 
 # =========================
 # 🔐 CONFIGURACIÓN GOOGLE OAUTH
@@ -33,6 +52,26 @@ def _build_flow():
     return flow
 
 
+# Parámetros que añade Google al volver del consentimiento; el resto son de la app (p. ej. trabajo_*)
+_PARAMS_OAUTH = {"code", "state", "scope", "authuser", "prompt", "hd", "iss"}
+
+
+def _codificar_estado(params):
+    """`state` de OAuth con un nonce y los parámetros de la app, para restaurarlos tras el callback."""
+    propios = {k: v for k, v in params.items() if k not in _PARAMS_OAUTH}
+    datos = json.dumps({"n": secrets.token_urlsafe(16), "q": propios}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(datos.encode()).decode().rstrip("=")
+
+
+def _decodificar_estado(state):
+    """Parámetros de la app guardados en `state`; vacío si no vienen en ese formato."""
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(state + "=" * (-len(state) % 4)))
+        return {str(k): str(v) for k, v in datos.get("q", {}).items()}
+    except (ValueError, TypeError, AttributeError):
+        return {}
+
+
 def get_google_creds():
     # 1️⃣ Ya autenticado
     if "google_creds" in st.session_state:
@@ -41,8 +80,14 @@ def get_google_creds():
         if creds and creds.valid:
             return creds
         if creds and creds.expired and creds.refresh_token:
-            creds.refresh(requests.Request())
-            st.session_state["google_creds"] = json.loads(creds.to_json())
+            # Varias ejecuciones de la misma sesión (fragmentos, hilos) pueden llegar aquí a la vez:
+            # solo una refresca y las demás toman el token ya renovado
+            with lock_credencial(creds.refresh_token):
+                vigente = Credentials.from_authorized_user_info(st.session_state["google_creds"], SCOPES)
+                if vigente.valid:
+                    return vigente
+                creds.refresh(GoogleAuthRequest())
+                st.session_state["google_creds"] = json.loads(creds.to_json())
             return creds
 
     # 2️⃣ Si vengo del callback de Google (url con ?code=...)
@@ -56,7 +101,8 @@ def get_google_creds():
         flow.fetch_token(authorization_response=full_url)
         creds = flow.credentials
         st.session_state["google_creds"] = json.loads(creds.to_json())
-        st.query_params.clear()
+        # 🔁 Se quita el código de la URL pero se conservan los parámetros de la app (trabajos en curso)
+        st.query_params.from_dict(_decodificar_estado(params.get("state", "")))
         return creds
 
     # 3️⃣ Mostrar botón de autorización si no hay sesión
@@ -66,7 +112,8 @@ def get_google_creds():
         auth_url, state = flow.authorization_url(
             access_type="offline",
             prompt="consent",
-            include_granted_scopes="true"
+            include_granted_scopes="true",
+            state=_codificar_estado(st.query_params.to_dict())
         )
         st.session_state["oauth_state"] = state
         st.markdown(f"[Haz clic aquí para autorizar tu cuenta de Google]({auth_url})")
@@ -75,41 +122,376 @@ def get_google_creds():
     st.stop()
 
 
+# === Credenciales del contexto actual ===
+# Fuera de Streamlit (CLI, hilos de trabajo) las credenciales se fijan con `usar_credenciales`.
+_CREDENCIALES = contextvars.ContextVar("credenciales_google", default=None)
+
+
+@contextmanager
+def usar_credenciales(creds):
+    """Usa `creds` para los servicios de Google dentro del bloque, sin pasar por la sesión de Streamlit."""
+    token = _CREDENCIALES.set(creds)
+    try:
+        yield creds
+    finally:
+        _CREDENCIALES.reset(token)
+
+
+def credenciales_actuales():
+    creds = _CREDENCIALES.get()
+    return creds if creds is not None else get_google_creds()
+
+
+# === Pool de transportes HTTP autorizados ===
+# httplib2 no es thread-safe: cada (credencial, hilo) tiene su propio AuthorizedHttp. Los que
+# quedan inactivos o cuyo hilo ya terminó se cierran y se descartan.
+TRANSPORTE_INACTIVO_MAX = int(os.environ.get("GOOGLE_TRANSPORTE_INACTIVO_MAX", 10 * 60))
+INTERVALO_PURGA_TRANSPORTES = 60
+_transportes = {}  # (clave de credencial, hilo) -> [transporte, último uso]
+_transportes_lock = threading.Lock()
+_ultima_purga = 0.0
+_locks_credenciales = {}
+# Fábrica opcional de transportes httplib2 (p. ej. dobles locales para benchmarks); None = red real
+_fabrica_transporte = None
+
+
+def clave_credenciales(creds):
+    return getattr(creds, "refresh_token", None) or getattr(creds, "token", None) or id(creds)
+
+
+def lock_credencial(clave):
+    """Lock compartido por todos los usos de una credencial, para serializar la renovación del token."""
+    with _transportes_lock:
+        return _locks_credenciales.setdefault(clave, threading.Lock())
+
+
+def _cerrar_transporte(transporte):
+    cerrar = getattr(getattr(transporte, "http", transporte), "close", None)
+    if cerrar is not None:
+        cerrar()
+
+
+def _purgar_transportes(ahora: float):
+    global _ultima_purga
+    if ahora - _ultima_purga < INTERVALO_PURGA_TRANSPORTES:
+        return
+    _ultima_purga = ahora
+    hilos_vivos = {hilo.ident for hilo in threading.enumerate()}
+    for clave in list(_transportes):
+        transporte, ultimo_uso = _transportes[clave]
+        if clave[1] not in hilos_vivos or ahora - ultimo_uso > TRANSPORTE_INACTIVO_MAX:
+            del _transportes[clave]
+            _cerrar_transporte(transporte)
+            metricas.incrementar("google_transportes_total", evento="desalojado")
+
+
+def _asegurar_token(creds, clave):
+    # Los hilos de un trabajo comparten el mismo objeto de credenciales: solo uno lo renueva
+    if getattr(creds, "valid", True) or not hasattr(creds, "refresh"):
+        return
+    with lock_credencial(clave):
+        if not creds.valid:
+            creds.refresh(GoogleAuthRequest())
+
+
+def obtener_transporte():
+    """AuthorizedHttp de la credencial actual para el hilo actual; se crea al primer uso."""
+    creds = credenciales_actuales()
+    clave_creds = clave_credenciales(creds)
+    _asegurar_token(creds, clave_creds)
+    clave = (clave_creds, threading.get_ident())
+    ahora = time.monotonic()
+    with _transportes_lock:
+        _purgar_transportes(ahora)
+        entrada = _transportes.get(clave)
+        if entrada is not None:
+            entrada[1] = ahora
+            # La sesión pudo haber renovado el token desde que se creó el transporte
+            entrada[0].credentials = creds
+            return entrada[0]
+        base = _fabrica_transporte() if _fabrica_transporte is not None else httplib2.Http()
+        transporte = AuthorizedHttp(creds, http=base)
+        _transportes[clave] = [transporte, ahora]
+    metricas.incrementar("google_transportes_total", evento="creado")
+    return transporte
+
+
+def configurar_transporte_google(fabrica):
+    """Sustituye el transporte HTTP de los servicios de Google; `fabrica()` devuelve un objeto tipo httplib2.Http."""
+    global _fabrica_transporte
+    with _transportes_lock:
+        _fabrica_transporte = fabrica
+        for transporte, _ in _transportes.values():
+            _cerrar_transporte(transporte)
+        _transportes.clear()
+
+
+class TransportePorHilo:
+    """Objeto tipo httplib2.Http que envía cada petición por el transporte de la credencial e hilo actuales."""
+
+    def request(self, *args, **kwargs):
+        return obtener_transporte().request(*args, **kwargs)
+
+    def close(self):
+        pass
+
+
+class HttpRequestMedido(HttpRequest):
+    """HttpRequest que registra latencia y resultado de cada llamada a Docs/Drive/Sheets."""
+
+    def execute(self, *args, **kwargs):
+        estado = "ok"
+        try:
+            with metricas.medir("google_api_latencia_segundos", metodo=self.methodId):
+                return super().execute(*args, **kwargs)
+        except Exception as e:
+            estado = getattr(getattr(e, "resp", None), "status", None) or type(e).__name__
+            raise
+        finally:
+            metricas.incrementar("google_api_llamadas_total", metodo=self.methodId, estado=estado)
+
+
+# === Servicios de Google: se construyen una vez por API y se comparten ===
+# El servicio no guarda estado de conexión: cada petición sale por `TransportePorHilo`, así que
+# hilos y sesiones con credenciales distintas pueden usarlo a la vez.
+_servicios = {}
+_servicios_lock = threading.Lock()
+
+
+def _obtener_servicio(api, version):
+    clave = (api, version)
+    servicio = _servicios.get(clave)
+    if servicio is None:
+        with _servicios_lock:
+            servicio = _servicios.get(clave)
+            if servicio is None:
+                # Documento de discovery incluido en la librería: no hay descarga por red
+                servicio = build(api, version, http=TransportePorHilo(), static_discovery=True,
+                                 requestBuilder=HttpRequestMedido)
+                _servicios[clave] = servicio
+    return servicio
+
+
+def get_docs_service():
+    return _obtener_servicio("docs", "v1")
+
+
+def get_drive_service():
+    return _obtener_servicio("drive", "v3")
+
+
+def get_sheets_service():
+    return _obtener_servicio("sheets", "v4")
+
+
 def build_services():
-    creds = get_google_creds()
-    docs_service = build("docs", "v1", credentials=creds)
-    drive_service = build("drive", "v3", credentials=creds)
-    sheets_service = build("sheets", "v4", credentials=creds)
-    return docs_service, drive_service, sheets_service
+    return get_docs_service(), get_drive_service(), get_sheets_service()
+
+
+# =========================
+# 🧵 CONCURRENCIA
+# =========================
+def enviar_tarea(executor, fn, *args, **kwargs):
+    """Envía `fn` al executor conservando el contexto de Streamlit y las credenciales del hilo actual.
+
+    Así las llamadas a `st.*` (errores, secrets, session_state) siguen funcionando dentro de los hilos.
+    """
+    try:
+        from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except ImportError:
+        ctx = None
+
+    contexto = contextvars.copy_context()
 
+    def _ejecutar():
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        return contexto.run(fn, *args, **kwargs)
+
+    return executor.submit(_ejecutar)
 
-# === Inicializamos los servicios globales ===
-docs_service, drive_service, sheets_service = build_services()
 
 # =========================
 # 🤖 GEMINI API
 # =========================
-def call_gemini(prompt: str) -> str:
-    url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
-    headers = {"Content-Type": "application/json"}
-    params = {"key": st.secrets["GEMINI_API_KEY"]}
+GEMINI_BASE_URL = os.environ.get("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta")
+# El mínimo de tokens del caché de contexto depende del modelo (ver contexto_gemini.MIN_TOKENS_POR_MODELO)
+GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-2.0-flash")
+GEMINI_GENERATION_CONFIG = {"maxOutputTokens": 3000}
+
+
+def gemini_api_key() -> str:
+    # La variable de entorno permite usar el módulo sin Streamlit (CLI, trabajos en segundo plano)
+    return os.environ.get("GEMINI_API_KEY") or st.secrets["GEMINI_API_KEY"]
+
+
+def _registrar_uso(uso):
+    if not uso:
+        return
+    metricas.incrementar("gemini_tokens_total", uso.get("promptTokenCount", 0), tipo="prompt")
+    metricas.incrementar("gemini_tokens_total", uso.get("candidatesTokenCount", 0), tipo="salida")
+    # Parte del prompt que vino de un contexto en caché (se cobra a tarifa reducida)
+    metricas.incrementar("gemini_tokens_total", uso.get("cachedContentTokenCount", 0), tipo="contexto_cache")
+
+
+def _post_generacion(url: str, params: dict, prompt: str, prefijo: str, config: dict, stream: bool = False):
+    """POST de generación. Si `prefijo` está en un contexto en caché, solo se envía `prompt`.
+
+    Si la llamada con el contexto falla (expiró o se borró en el servidor), se descarta y se
+    repite con el prompt completo.
+    """
+    completo = (prefijo or "") + prompt
+    tokens_estimados = estimar_tokens(completo) + config["maxOutputTokens"]
+    contexto = obtener_contexto(GEMINI_BASE_URL, GEMINI_MODEL, params["key"], prefijo) if prefijo else None
+    if contexto:
+        data = {
+            "cachedContent": contexto,
+            "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+            "generationConfig": config,
+        }
+        response = post_gemini(url, params=params, data=data, tokens_estimados=tokens_estimados, stream=stream)
+        if response.status_code != 200 and response.status_code not in CODIGOS_REINTENTABLES:
+            response.close()
+            invalidar_contexto(GEMINI_MODEL, prefijo, contexto)
+        else:
+            return response
+
     data = {
-        "contents": [{"parts": [{"text": prompt}]}],
-        "generationConfig": {"maxOutputTokens": 3000},
+        "contents": [{"parts": [{"text": completo}]}],
+        "generationConfig": config,
     }
+    return post_gemini(url, params=params, data=data, tokens_estimados=tokens_estimados, stream=stream)
 
-    response = requests.post(url, headers=headers, params=params, json=data)
+
+def call_gemini_con_fin(prompt: str, usar_cache: bool = True, refrescar: bool = False,
+                        generation_config: dict = None, prefijo: str = None) -> tuple:
+    """Como `call_gemini`, pero devuelve (texto, finishReason).
+
+    Una respuesta cortada por el límite de salida llega con finishReason "MAX_TOKENS"; esas no se
+    guardan en la caché, para que una nueva llamada pueda completarlas. Un acierto de caché se
+    reporta como "STOP".
+    """
+    config = {**GEMINI_GENERATION_CONFIG, **(generation_config or {})}
+    cache = obtener_cache() if usar_cache else None
+    clave = clave_cache(GEMINI_MODEL, config, (prefijo or "") + prompt)
+    if cache is not None and not refrescar:
+        cacheado = cache.obtener(clave)
+        metricas.incrementar("gemini_cache_total", resultado="acierto" if cacheado is not None else "fallo")
+        if cacheado is not None:
+            return cacheado, "STOP"
+
+    url = f"{GEMINI_BASE_URL}/models/{GEMINI_MODEL}:generateContent"
+    params = {"key": gemini_api_key()}
+    response = _post_generacion(url, params, prompt, prefijo, config)
     if response.status_code == 200:
-        return response.json()["candidates"][0]["content"]["parts"][0]["text"].strip()
+        respuesta = response.json()
+        _registrar_uso(respuesta.get("usageMetadata"))
+        candidato = respuesta["candidates"][0]
+        texto = candidato["content"]["parts"][0]["text"].strip()
+        fin = candidato.get("finishReason", "STOP")
+        metricas.incrementar("gemini_fin_total", razon=fin)
+        if cache is not None and fin != "MAX_TOKENS":
+            cache.guardar(clave, texto)
+        return texto, fin
     else:
-        st.error(f"Error en API Gemini: {response.status_code} - {response.text}")
-        raise Exception("Fallo la llamada a Gemini con API Key.")
+        raise Exception(f"Fallo la llamada a Gemini: {response.status_code} - {response.text[:500]}")
+
+
+def call_gemini(prompt: str, usar_cache: bool = True, refrescar: bool = False, generation_config: dict = None,
+                prefijo: str = None) -> str:
+    """Llama a Gemini con `prompt`.
+
+    Las respuestas se guardan en una caché en disco compartida entre procesos. `usar_cache=False`
+    la ignora por completo y `refrescar=True` fuerza una nueva llamada que sobrescribe la entrada.
+    `generation_config` se combina con `GEMINI_GENERATION_CONFIG` (p. ej. para pedir JSON con esquema).
+    `prefijo` es la parte del prompt común a varias llamadas: va antes de `prompt` y se sube una
+    sola vez como contexto en caché de Gemini (ver `contexto_gemini`).
+    """
+    return call_gemini_con_fin(prompt, usar_cache, refrescar, generation_config, prefijo)[0]
+
+
+def call_gemini_stream(prompt: str, usar_cache: bool = True, refrescar: bool = False, prefijo: str = None):
+    """Versión en streaming de `call_gemini`: genera fragmentos de texto conforme llegan (SSE).
+
+    Si el consumidor cierra el generador antes de terminar, la conexión se cierra y no se sigue
+    pagando la respuesta. Solo las respuestas completas se guardan en la caché: tampoco las cortadas
+    por el límite de salida (finishReason "MAX_TOKENS" en el último evento).
+    """
+    cache = obtener_cache() if usar_cache else None
+    clave = clave_cache(GEMINI_MODEL, GEMINI_GENERATION_CONFIG, (prefijo or "") + prompt)
+    if cache is not None and not refrescar:
+        cacheado = cache.obtener(clave)
+        metricas.incrementar("gemini_cache_total", resultado="acierto" if cacheado is not None else "fallo")
+        if cacheado is not None:
+            yield cacheado
+            return
+
+    url = f"{GEMINI_BASE_URL}/models/{GEMINI_MODEL}:streamGenerateContent"
+    params = {"key": gemini_api_key(), "alt": "sse"}
+    response = _post_generacion(url, params, prompt, prefijo, GEMINI_GENERATION_CONFIG, stream=True)
+    try:
+        if response.status_code != 200:
+            # En los hilos de trabajo no hay página donde mostrar un st.error: el detalle va en la excepción
+            raise Exception(f"Fallo la llamada a Gemini: {response.status_code} - {response.text[:500]}")
+
+        partes = []
+        uso = None
+        fin = "STOP"
+        for linea in response.iter_lines(decode_unicode=True):
+            if not linea or not linea.startswith("data:"):
+                continue
+            evento = json.loads(linea[len("data:"):].strip())
+            # Cada evento trae el uso acumulado; el último es el total
+            uso = evento.get("usageMetadata", uso)
+            for candidato in evento.get("candidates", [])[:1]:
+                fin = candidato.get("finishReason", fin)
+                for parte in candidato.get("content", {}).get("parts", []):
+                    fragmento = parte.get("text", "")
+                    if fragmento:
+                        partes.append(fragmento)
+                        yield fragmento
+
+        _registrar_uso(uso)
+        metricas.incrementar("gemini_fin_total", razon=fin)
+        if cache is not None and fin != "MAX_TOKENS":
+            cache.guardar(clave, "".join(partes).strip())
+    finally:
+        response.close()
+
+
+def generar_texto(prompt: str, al_recibir=None, refrescar: bool = False, prefijo: str = None) -> str:
+    """Llama a Gemini y devuelve el texto completo.
+
+    Si se pasa `al_recibir`, la respuesta se pide en streaming y la función se invoca con el texto
+    acumulado tras cada fragmento. Una excepción dentro de `al_recibir` cancela la generación.
+    `prefijo` es la parte común del prompt que se comparte en caché entre llamadas.
+    """
+    if al_recibir is None:
+        return call_gemini(prompt, refrescar=refrescar, prefijo=prefijo)
+    texto = ""
+    for fragmento in call_gemini_stream(prompt, refrescar=refrescar, prefijo=prefijo):
+        texto += fragmento
+        al_recibir(texto)
+    return texto.strip()
 
 
 # =========================
 # 🧠 PROMPTING Y LÓGICA DE GENERACIÓN
 # =========================
+# Perfil fijo del estudiante tipo
+STUDENT_PERSONA = (
+    "Usuario de negocios quiere construir productos de datos pero:\n"
+    "- No tiene el hábito o modelo de trabajo mental de tomar decisiones basadas en datos.\n"
+    "- No tiene conocimiento suficiente para traducir sus problemas a productos de datos.\n"
+    "- No tiene habilidades técnicas para manipular data.\n"
+    "- No colabora activamente con equipos de data.\n"
+    "- Tiene poco tiempo y necesita soluciones prácticas que le ayuden a avanzar ya."
+)
+INDUSTRIA_DEFAULT = "analítica de datos"
+
 @st.cache_data(show_spinner=False)
+@metricas.cronometrar("datos_generales")
 def generar_datos_generales(nombre_del_curso, nivel, publico, student_persona, siguiente, objetivos_raw):
     prompt = f"""
     Eres un experto en diseño instruccional y un tutor experimentado, aplicando los principios de la ciencia del aprendizaje
@@ -174,15 +556,289 @@ def generar_datos_generales(nombre_del_curso, nivel, publico, student_persona, s
     return perfil_ingreso, objetivos, perfil_egreso, outline, titulo1, desc1, titulo2, desc2, titulo3, desc3
 
 
-# === REEMPLAZO DE PLACEHOLDERS EN LA PLANTILLA ===
+# === MODO ESTRUCTURADO: UNA SOLA LLAMADA CON RESPUESTA JSON ===
+_TEXTO = {"type": "STRING"}
+COLUMNAS_OUTLINE = ["Clase", "Título", "Conceptos Clave", "Objetivo 1", "Objetivo 2", "Objetivo 3", "Descripción"]
+CAMPOS_FILA_OUTLINE = ["clase", "titulo", "conceptos_clave", "objetivo_1", "objetivo_2", "objetivo_3", "descripcion"]
+CAMPOS_DATOS_ESTRUCTURADOS = [
+    "perfil_ingreso", "objetivos", "perfil_egreso",
+    "titulo_primer_objetivo_secundario", "descripcion_primer_objetivo_secundario",
+    "titulo_segundo_objetivo_secundario", "descripcion_segundo_objetivo_secundario",
+    "titulo_tercer_objetivo_secundario", "descripcion_tercer_objetivo_secundario",
+    "generalidades_del_programa", "perfil_ingreso_parrafo", "detalles_plan_estudios",
+]
+ESQUEMA_DATOS_ESTRUCTURADOS = {
+    "type": "OBJECT",
+    "properties": {
+        **{campo: _TEXTO for campo in CAMPOS_DATOS_ESTRUCTURADOS},
+        "outline": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {campo: ({"type": "INTEGER"} if campo == "clase" else _TEXTO) for campo in CAMPOS_FILA_OUTLINE},
+                "required": CAMPOS_FILA_OUTLINE,
+                "propertyOrdering": CAMPOS_FILA_OUTLINE,
+            },
+        },
+    },
+    "required": CAMPOS_DATOS_ESTRUCTURADOS + ["outline"],
+    "propertyOrdering": CAMPOS_DATOS_ESTRUCTURADOS + ["outline"],
+}
+CLASES_POR_CURSO = 12
+
+
+def parsear_datos_estructurados(texto: str, clases_esperadas: int = CLASES_POR_CURSO) -> dict:
+    """Valida la respuesta JSON del modo estructurado. Lanza ValueError si falta o sobra algo."""
+    try:
+        datos = json.loads(texto)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"La respuesta de Gemini no es JSON válido: {e}") from e
+    if not isinstance(datos, dict):
+        raise ValueError("La respuesta de Gemini no es un objeto JSON")
+
+    faltantes = [campo for campo in CAMPOS_DATOS_ESTRUCTURADOS if not str(datos.get(campo) or "").strip()]
+    if faltantes:
+        raise ValueError(f"Faltan campos en la respuesta de Gemini: {', '.join(faltantes)}")
+
+    filas = datos.get("outline")
+    if not isinstance(filas, list) or len(filas) != clases_esperadas:
+        raise ValueError(f"El outline debe tener {clases_esperadas} clases y tiene {len(filas) if isinstance(filas, list) else 0}")
+    outline = []
+    for idx, fila in enumerate(filas, 1):
+        if not isinstance(fila, dict) or any(campo not in fila for campo in CAMPOS_FILA_OUTLINE):
+            raise ValueError(f"La fila {idx} del outline está incompleta")
+        # Saltos de línea y pipes romperían la tabla Markdown y la hoja
+        outline.append({
+            campo: re.sub(r"[\r\n\t]+", " ", str(fila[campo])).replace("|", "/").strip()
+            for campo in CAMPOS_FILA_OUTLINE
+        })
+
+    resultado = {campo: str(datos[campo]).strip() for campo in CAMPOS_DATOS_ESTRUCTURADOS}
+    resultado["outline"] = outline
+    return resultado
+
+
+def outline_a_markdown(filas: list) -> str:
+    """Convierte las filas del outline estructurado en la tabla Markdown que usa el resto del pipeline."""
+    lineas = ["| " + " | ".join(COLUMNAS_OUTLINE) + " |", "|" + "---|" * len(COLUMNAS_OUTLINE)]
+    for fila in filas:
+        lineas.append("| " + " | ".join(str(fila[campo]) for campo in CAMPOS_FILA_OUTLINE) + " |")
+    return "\n".join(lineas)
+
+
+@st.cache_data(show_spinner=False)
+@metricas.cronometrar("datos_estructurados")
+def generar_datos_estructurados(nombre_del_curso, nivel, publico, student_persona, siguiente, objetivos_raw):
+    """Pide en una sola llamada todos los datos del syllabus, incluidas las tres secciones y el outline.
+
+    Devuelve un dict validado con las claves de `CAMPOS_DATOS_ESTRUCTURADOS`, `outline` (filas)
+    y `outline_markdown`.
+    """
+    prompt = f"""
+    Eres un experto en diseño instruccional y un tutor experimentado, aplicando los principios de la ciencia del aprendizaje
+    (LearnLM) para crear experiencias educativas efectivas y atractivas. Tu objetivo es generar un syllabus y outline
+    que fomenten el aprendizaje activo, gestionen la carga cognitiva del estudiante y adapten el contenido
+    a sus necesidades, inspirando curiosidad y profundizando la metacognición.
+
+    Con base en los siguientes datos:
+    - Curso: {nombre_del_curso}
+    - Nivel: {nivel}
+    - Público objetivo: {publico}
+    - Perfil base del estudiante: {student_persona}
+    - Objetivos iniciales: {objetivos_raw}
+    - Curso sugerido posterior: {siguiente} (no lo menciones directamente)
+
+    Completa todos los campos del JSON:
+    - perfil_ingreso, objetivos, perfil_egreso: texto del syllabus.
+    - titulo_*_objetivo_secundario y descripcion_*_objetivo_secundario: tres objetivos secundarios.
+    - generalidades_del_programa: párrafo breve que combine descripción general del curso, su objetivo y el perfil de egreso.
+    - perfil_ingreso_parrafo: párrafo claro y directo del perfil de ingreso del estudiante.
+    - detalles_plan_estudios: lista de las {CLASES_POR_CURSO} clases, cada una con título y una breve descripción, sin negritas en markdown.
+    - outline: exactamente {CLASES_POR_CURSO} clases (4 por semana durante 3 semanas), numeradas desde 1.
+    """
+    config = {
+        "responseMimeType": "application/json",
+        "responseSchema": ESQUEMA_DATOS_ESTRUCTURADOS,
+        "maxOutputTokens": 8192,
+    }
+    try:
+        datos = parsear_datos_estructurados(call_gemini(prompt, generation_config=config))
+    except ValueError:
+        # La salida con esquema casi nunca falla; si lo hace, se pide una vez más sin usar la caché
+        datos = parsear_datos_estructurados(call_gemini(prompt, refrescar=True, generation_config=config))
+    datos["outline_markdown"] = outline_a_markdown(datos["outline"])
+    return datos
+
+
+def tupla_datos_generales(datos: dict) -> tuple:
+    """Datos estructurados en el mismo orden que devuelve `generar_datos_generales`."""
+    return (
+        datos["perfil_ingreso"], datos["objetivos"], datos["perfil_egreso"], datos["outline_markdown"],
+        datos["titulo_primer_objetivo_secundario"], datos["descripcion_primer_objetivo_secundario"],
+        datos["titulo_segundo_objetivo_secundario"], datos["descripcion_segundo_objetivo_secundario"],
+        datos["titulo_tercer_objetivo_secundario"], datos["descripcion_tercer_objetivo_secundario"],
+    )
+
+
+def secciones_estructuradas(datos: dict) -> dict:
+    """Secciones del syllabus ya generadas, listas para `generar_syllabus_completo(secciones=...)`."""
+    return {
+        "GENERALIDADES_DEL_PROGRAMA": datos["generalidades_del_programa"],
+        "PERFIL_INGRESO": datos["perfil_ingreso_parrafo"],
+        "DETALLES_PLAN_ESTUDIOS": datos["detalles_plan_estudios"],
+    }
+
+
+# === CONSTRUCTOR DE DOCUMENTOS (UN SOLO batchUpdate) ===
+# Límites conservadores para no exceder el tamaño de payload de la API de Docs
+MAX_SOLICITUDES_POR_LOTE = 500
+MAX_BYTES_POR_LOTE = 4_000_000
+
+
+def longitud_docs(texto: str) -> int:
+    """Longitud de un texto en índices de Google Docs (unidades UTF-16, no caracteres de Python)."""
+    return len(texto.encode("utf-16-le")) // 2
+
+
+# Viñetas de Docs equivalentes a las listas <ul>/<ol> del HTML que se sube al crear los documentos
+PRESET_VINETAS = {"ul": "BULLET_DISC_CIRCLE_SQUARE", "ol": "NUMBERED_DECIMAL_ALPHA_ROMAN"}
+
+
+class ConstructorDocumento:
+    """Acumula operaciones replaceAllText/insertText/updateParagraphStyle/... de un documento y las envía en el menor número de batchUpdate."""
+
+    def __init__(self, document_id: str, indice_inicial: int = 1):
+        self.document_id = document_id
+        self.solicitudes = []
+        self.indice = indice_inicial  # Posición donde se insertará el siguiente texto
+
+    def reemplazar(self, placeholder: str, nuevo_texto: str):
+        self.solicitudes.append({
+            "replaceAllText": {
+                "containsText": {"text": placeholder, "matchCase": True},
+                "replaceText": nuevo_texto
+            }
+        })
+        return self
+
+    def borrar_rango(self, inicio: int, fin: int):
+        self.solicitudes.append({"deleteContentRange": {"range": {"startIndex": inicio, "endIndex": fin}}})
+        return self
+
+    def estilo_parrafo(self, inicio: int, fin: int, estilo: str):
+        """Aplica un estilo con nombre (p. ej. HEADING_1, NORMAL_TEXT) a los párrafos del rango."""
+        self.solicitudes.append({
+            "updateParagraphStyle": {
+                "range": {"startIndex": inicio, "endIndex": fin},
+                "paragraphStyle": {"namedStyleType": estilo},
+                "fields": "namedStyleType"
+            }
+        })
+        return self
+
+    def agregar_texto(self, texto: str):
+        """Agrega `texto` al final de lo ya insertado y devuelve su rango (inicio, fin) en el documento."""
+        inicio = self.indice
+        self.solicitudes.append({
+            "insertText": {
+                "location": {"index": inicio},
+                "text": texto
+            }
+        })
+        self.indice += longitud_docs(texto)
+        return inicio, self.indice
+
+    def agregar_parrafos(self, parrafos: list, salto_final: bool = True):
+        """Inserta párrafos de `render_documentos.markdown_a_parrafos` con sus estilos, viñetas y formato.
+
+        Todo el texto va en un solo insertText; sin `salto_final`, el último párrafo se une al que ya
+        sigue en el documento. Devuelve el rango (inicio, fin) insertado.
+        """
+        texto = "\n".join("".join(t for t, _ in p["tramos"]) for p in parrafos) + ("\n" if salto_final else "")
+        inicio, fin = self.agregar_texto(texto)
+        # El texto insertado hereda el formato y las viñetas de donde cae: se limpian antes de aplicar los propios
+        self.solicitudes.append({
+            "updateTextStyle": {
+                "range": {"startIndex": inicio, "endIndex": fin},
+                "textStyle": {},
+                "fields": "bold,italic,link"
+            }
+        })
+        self.solicitudes.append({"deleteParagraphBullets": {"range": {"startIndex": inicio, "endIndex": fin}}})
+        posicion, listas = inicio, []  # listas = [viñeta, inicio, fin] de párrafos seguidos del mismo tipo
+        for parrafo in parrafos:
+            inicio_parrafo = posicion
+            for tramo, estilo in parrafo["tramos"]:
+                largo = longitud_docs(tramo)
+                if estilo:
+                    self.solicitudes.append({
+                        "updateTextStyle": {
+                            "range": {"startIndex": posicion, "endIndex": posicion + largo},
+                            "textStyle": estilo,
+                            "fields": ",".join(estilo)
+                        }
+                    })
+                posicion += largo
+            posicion += 1  # Salto de línea del párrafo
+            self.estilo_parrafo(inicio_parrafo, min(posicion, fin), parrafo["estilo"])
+            if parrafo["lista"]:
+                if listas and listas[-1][0] == parrafo["lista"] and listas[-1][2] == inicio_parrafo:
+                    listas[-1][2] = posicion
+                else:
+                    listas.append([parrafo["lista"], inicio_parrafo, posicion])
+        for tipo, inicio_lista, fin_lista in listas:
+            self.solicitudes.append({
+                "createParagraphBullets": {
+                    "range": {"startIndex": inicio_lista, "endIndex": min(fin_lista, fin)},
+                    "bulletPreset": PRESET_VINETAS[tipo]
+                }
+            })
+        return inicio, fin
+
+    def _lotes(self):
+        lote, tamano = [], 0
+        for solicitud in self.solicitudes:
+            peso = len(json.dumps(solicitud, ensure_ascii=False).encode("utf-8"))
+            if lote and (len(lote) >= MAX_SOLICITUDES_POR_LOTE or tamano + peso > MAX_BYTES_POR_LOTE):
+                yield lote
+                lote, tamano = [], 0
+            lote.append(solicitud)
+            tamano += peso
+        if lote:
+            yield lote
+
+    def ejecutar(self):
+        """Envía las operaciones pendientes. Devuelve el número de llamadas hechas a la API."""
+        llamadas = 0
+        for lote in self._lotes():
+            get_docs_service().documents().batchUpdate(
+                documentId=self.document_id, body={"requests": lote}
+            ).execute()
+            llamadas += 1
+        self.solicitudes = []
+        return llamadas
+
+
 def replace_placeholder(document_id, placeholder, new_text):
-    requests = [{
-        "replaceAllText": {
-            "containsText": {"text": placeholder, "matchCase": True},
-            "replaceText": new_text
-        }
-    }]
-    docs_service.documents().batchUpdate(documentId=document_id, body={"requests": requests}).execute()
+    ConstructorDocumento(document_id).reemplazar(placeholder, new_text).ejecutar()
+
+
+# === CARGA DE DOCUMENTOS RENDERIZADOS ===
+# Hasta este tamaño se usa una carga multipart (una sola petición); por encima, Drive exige carga reanudable
+MAX_BYTES_CARGA_MULTIPART = 5 * 1024 * 1024
+
+
+def subir_documento_html(nombre: str, contenido_html: str) -> str:
+    """Crea un Google Doc a partir de HTML; Drive lo convierte al subirlo. Devuelve el ID del documento."""
+    datos = contenido_html.encode("utf-8")
+    media = MediaIoBaseUpload(io.BytesIO(datos), mimetype="text/html",
+                              resumable=len(datos) > MAX_BYTES_CARGA_MULTIPART)
+    documento = get_drive_service().files().create(
+        body={"name": nombre, "mimeType": "application/vnd.google-apps.document"},
+        media_body=media,
+        fields="id"
+    ).execute()
+    return documento["id"]
 
 
 # =========================
@@ -190,13 +846,50 @@ def replace_placeholder(document_id, placeholder, new_text):
 # =========================
 TEMPLATE_ID = "1I2jMQ1IjmG6_22dC7u6LYQfQzlND4WIvEusd756LFuo"
 
+
+def copiar_plantilla(nombre_documento):
+    """Copia la plantilla del syllabus, la comparte con el dominio y devuelve el ID de la copia.
+
+    Si hay una copia lista en el pool (`pool_plantillas`), se reclama esa en una sola llamada.
+    """
+    document_id = pool_plantillas.reclamar(pool_plantillas.SYLLABUS, nombre_documento)
+    if document_id:
+        return document_id
+    template_copy = get_drive_service().files().copy(
+        fileId=TEMPLATE_ID,
+        body={"name": nombre_documento}
+    ).execute()
+    document_id = template_copy["id"]
+    # 🔐 Dar acceso a todo el dominio datarebels.mx
+    get_drive_service().permissions().create(
+        fileId=document_id,
+        body={
+            "type": "domain",
+            "role": "writer",      # Usa "reader" si solo quieres lectura
+            "domain": "datarebels.mx",
+            "allowFileDiscovery": True
+        },
+        fields="id"
+    ).execute()
+    return document_id
+
+
+@metricas.cronometrar("syllabus")
 def generar_syllabus_completo(nombre_del_curso, nivel, objetivos_mejorados, publico, siguiente,
                                perfil_ingreso, perfil_egreso, outline,
-                               titulo1, desc1, titulo2, desc2, titulo3, desc3):
+                               titulo1, desc1, titulo2, desc2, titulo3, desc3, al_recibir=None,
+                               secciones=None):
+    """Crea el syllabus en Google Docs y devuelve su link.
+
+    `al_recibir(etiqueta, texto)` permite mostrar cada sección mientras se genera.
+    `secciones` (etiqueta → texto) evita pedir a Gemini las secciones que ya vienen generadas,
+    como en el modo estructurado.
+    """
+    secciones = secciones or {}
     anio = 2025
 
-    def pedir_seccion(etiqueta, instruccion):
-        prompt = f"""
+    # El contexto del curso es idéntico en las tres secciones: se comparte como prefijo en caché
+    contexto_curso = f"""
         Como experto en diseño instruccional y aplicando los principios de LearnLM, genera el siguiente contenido:
         Curso: {nombre_del_curso}
         Año: {anio}
@@ -206,84 +899,171 @@ def generar_syllabus_completo(nombre_del_curso, nivel, objetivos_mejorados, publ
         Perfil de egreso: {perfil_egreso}
         Outline:
         {outline}
-        Devuelve únicamente el contenido para la sección: [{etiqueta}]
+"""
+
+    def pedir_seccion(etiqueta, instruccion):
+        if secciones.get(etiqueta):
+            return secciones[etiqueta]
+        prompt = f"""        Devuelve únicamente el contenido para la sección: [{etiqueta}]
         {instruccion}
         """
-        respuesta = call_gemini(prompt)
+        callback = None if al_recibir is None else (lambda texto: al_recibir(etiqueta, texto))
+        respuesta = generar_texto(prompt, callback, prefijo=contexto_curso)
         return respuesta.strip()
 
-    generalidades = pedir_seccion("GENERALIDADES_DEL_PROGRAMA", "Redacta un párrafo breve que combine descripción general del curso, su objetivo y el perfil de egreso.")
-    ingreso = pedir_seccion("PERFIL_INGRESO", "Redacta un párrafo claro y directo del perfil de ingreso del estudiante.")
-    detalles = pedir_seccion("DETALLES_PLAN_ESTUDIOS", "Escribe la lista de 12 clases, cada una con título y una breve descripción, NO usar negritas en markdown.")
+    # 🚀 Las tres secciones y la copia de la plantilla no dependen entre sí: se lanzan a la vez
+    # y el llenado de placeholders empieza cuando todas terminan.
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        f_generalidades = enviar_tarea(executor, pedir_seccion, "GENERALIDADES_DEL_PROGRAMA", "Redacta un párrafo breve que combine descripción general del curso, su objetivo y el perfil de egreso.")
+        f_ingreso = enviar_tarea(executor, pedir_seccion, "PERFIL_INGRESO", "Redacta un párrafo claro y directo del perfil de ingreso del estudiante.")
+        f_detalles = enviar_tarea(executor, pedir_seccion, "DETALLES_PLAN_ESTUDIOS", "Escribe la lista de 12 clases, cada una con título y una breve descripción, NO usar negritas en markdown.")
+        f_documento = enviar_tarea(executor, copiar_plantilla, f"Syllabus - {nombre_del_curso}")
 
-    template_copy = drive_service.files().copy(
-        fileId=TEMPLATE_ID,
-        body={"name": f"Syllabus - {nombre_del_curso}"}
-    ).execute()
-    document_id = template_copy["id"]
-    # 🔐 Dar acceso a todo el dominio datarebels.mx
-    drive_service.permissions().create(
-        fileId=document_id,
-        body={
-            "type": "domain",
-            "role": "writer",      # Usa "reader" si solo quieres lectura
-            "domain": "datarebels.mx",
-            "allowFileDiscovery": True
-        },
-        fields="id"
-    ).execute()
+        try:
+            generalidades = f_generalidades.result()
+            ingreso = f_ingreso.result()
+            detalles = f_detalles.result()
+        except Exception:
+            # La copia ya puede existir (o venir del pool): no se deja un syllabus con placeholders en Drive
+            _descartar_documento(f_documento)
+            raise
+        document_id = f_documento.result()
+
+    try:
+        _llenar_syllabus(document_id, nombre_del_curso, anio, generalidades, ingreso, detalles,
+                         titulo1, desc1, titulo2, desc2, titulo3, desc3)
+    except Exception:
+        _descartar_documento(f_documento)
+        raise
+    return f"https://docs.google.com/document/d/{document_id}/edit"
 
 
-    replace_placeholder(document_id, "{{nombre_del_curso}}", nombre_del_curso)
-    replace_placeholder(document_id, "{{anio}}", str(anio))
-    replace_placeholder(document_id, "{{generalidades_del_programa}}", generalidades)
-    replace_placeholder(document_id, "{{perfil_ingreso}}", ingreso)
-    replace_placeholder(document_id, "{{detalles_plan_estudios}}", detalles)
-    replace_placeholder(document_id, "{{titulo_primer_objetivo_secundario}}", titulo1)
-    replace_placeholder(document_id, "{{descripcion_primer_objetivo_secundario}}", desc1)
-    replace_placeholder(document_id, "{{titulo_segundo_objetivo_secundario}}", titulo2)
-    replace_placeholder(document_id, "{{descripcion_segundo_objetivo_secundario}}", desc2)
-    replace_placeholder(document_id, "{{titulo_tercer_objetivo_secundario}}", titulo3)
-    replace_placeholder(document_id, "{{descripcion_tercer_objetivo_secundario}}", desc3)
+def _descartar_documento(futuro):
+    """Borra el documento de `futuro` si llegó a crearse; los errores al borrarlo no tapan el original."""
+    try:
+        get_drive_service().files().delete(fileId=futuro.result()).execute()
+    except Exception:
+        pass
 
-    return f"https://docs.google.com/document/d/{document_id}/edit"
+
+def _llenar_syllabus(document_id, nombre_del_curso, anio, generalidades, ingreso, detalles,
+                     titulo1, desc1, titulo2, desc2, titulo3, desc3):
+    # 📦 Todos los placeholders se reemplazan en una sola llamada a la API
+    constructor = ConstructorDocumento(document_id)
+    constructor.reemplazar("{{nombre_del_curso}}", nombre_del_curso)
+    constructor.reemplazar("{{anio}}", str(anio))
+    constructor.reemplazar("{{generalidades_del_programa}}", generalidades)
+    constructor.reemplazar("{{perfil_ingreso}}", ingreso)
+    constructor.reemplazar("{{detalles_plan_estudios}}", detalles)
+    constructor.reemplazar("{{titulo_primer_objetivo_secundario}}", titulo1)
+    constructor.reemplazar("{{descripcion_primer_objetivo_secundario}}", desc1)
+    constructor.reemplazar("{{titulo_segundo_objetivo_secundario}}", titulo2)
+    constructor.reemplazar("{{descripcion_segundo_objetivo_secundario}}", desc2)
+    constructor.reemplazar("{{titulo_tercer_objetivo_secundario}}", titulo3)
+    constructor.reemplazar("{{descripcion_tercer_objetivo_secundario}}", desc3)
+    constructor.ejecutar()
 
 
+# === OUTLINE EN MEMORIA ===
+# El outline recién escrito se guarda junto con la hora del servidor al escribirlo (cabecera Date, sin
+# llamadas extra) para no volver a leer la hoja; si alguien la edita después, su modifiedTime queda
+# posterior y se vuelve a leer. Comprobarlo cuesta una llamada de metadatos al leer.
+MAX_OUTLINES_EN_MEMORIA = 64
+_outlines = OrderedDict()  # spreadsheet_id -> (modifiedTime o cota de la escritura, valores con encabezado)
+_outlines_lock = threading.Lock()
+
+
+def id_desde_url_sheets(sheet_url: str) -> str:
+    match = re.search(r"/d/([a-zA-Z0-9-_]+)", sheet_url)
+    if not match:
+        raise ValueError("URL de Google Sheets no válida")
+    return match.group(1)
+
+
+def fecha_modificacion(file_id: str) -> str:
+    return get_drive_service().files().get(fileId=file_id, fields="modifiedTime").execute()["modifiedTime"]
+
+
+def ejecutar_con_fecha(peticion):
+    """Ejecuta una petición de Google y devuelve (respuesta, cota de la hora del servidor).
+
+    La cota es la cabecera Date más un segundo (Date no tiene fracciones), con el formato de
+    modifiedTime; None si la respuesta no la trae.
+    """
+    cabeceras = {}
+    postproc = peticion.postproc
+
+    def _postproc(resp, contenido):
+        cabeceras.update(resp)
+        return postproc(resp, contenido)
+
+    peticion.postproc = _postproc
+    respuesta = peticion.execute()
+    if not cabeceras.get("date"):
+        return respuesta, None
+    cota = parsedate_to_datetime(cabeceras["date"]) + timedelta(seconds=1)
+    return respuesta, cota.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def _instante(fecha: str) -> datetime:
+    return datetime.fromisoformat(fecha.replace("Z", "+00:00"))
+
+
+def sin_cambios(modificado: str, referencia) -> bool:
+    """True si el modifiedTime `modificado` no es posterior a `referencia` (None = desconocida)."""
+    return referencia is not None and _instante(modificado) <= _instante(referencia)
+
+
+def guardar_outline_en_memoria(spreadsheet_id: str, modificado, valores: list):
+    with _outlines_lock:
+        _outlines[spreadsheet_id] = (modificado, valores)
+        _outlines.move_to_end(spreadsheet_id)
+        while len(_outlines) > MAX_OUTLINES_EN_MEMORIA:
+            _outlines.popitem(last=False)
+
+
+def obtener_outline_en_memoria(spreadsheet_id: str):
+    """Devuelve (modifiedTime o cota de la escritura, valores) del outline en memoria, o None."""
+    with _outlines_lock:
+        entrada = _outlines.get(spreadsheet_id)
+        if entrada is not None:
+            _outlines.move_to_end(spreadsheet_id)
+        return entrada
+
+
+@metricas.cronometrar("outline")
 def generar_outline_csv(nombre_del_curso, nivel, objetivos_mejorados, perfil_ingreso, siguiente, outline):
-    lines = [line.strip() for line in outline.splitlines() if "|" in line and not line.startswith("|---")]
-    df = pd.read_csv(io.StringIO("\n".join(lines)), sep="|", engine="python", skipinitialspace=True)
-    df = df.dropna(axis=1, how="all")
-    df.columns = [col.strip() for col in df.columns]
-
-    # 🔧 Limpieza robusta de datos antes de enviar
-    df = df.fillna("")
-    df = df.astype(str)
-    df = df.applymap(lambda x: re.sub(r"[\r\n\t]", " ", x))
-
-    sheet = sheets_service.spreadsheets().create(
-        body={"properties": {"title": f"Outline - {nombre_del_curso}"}},
-        fields="spreadsheetId"
-    ).execute()
-    spreadsheet_id = sheet["spreadsheetId"]
-   
-    drive_service.permissions().create(
-    fileId=spreadsheet_id,
-    body={
-        "type": "domain",
-        "role": "writer",
-        "domain": "datarebels.mx",
-        "allowFileDiscovery": True
-    },
-    fields="id"
-    ).execute()
+    # 🔧 Una sola pasada: celdas limpias de saltos de línea/tabs, pipes escapados y filas irregulares
+    encabezados, filas = parsear_tabla(outline)
 
-    values = [df.columns.tolist()] + df.values.tolist()
-    sheets_service.spreadsheets().values().update(
+    # 🧊 Una hoja del pool ya está creada y compartida; si no hay, se crea como siempre
+    spreadsheet_id = pool_plantillas.reclamar(pool_plantillas.OUTLINE, f"Outline - {nombre_del_curso}")
+    if not spreadsheet_id:
+        sheet = get_sheets_service().spreadsheets().create(
+            body={"properties": {"title": f"Outline - {nombre_del_curso}"}},
+            fields="spreadsheetId"
+        ).execute()
+        spreadsheet_id = sheet["spreadsheetId"]
+
+        get_drive_service().permissions().create(
+            fileId=spreadsheet_id,
+            body={
+                "type": "domain",
+                "role": "writer",
+                "domain": "datarebels.mx",
+                "allowFileDiscovery": True
+            },
+            fields="id"
+        ).execute()
+
+    values = [encabezados] + filas
+    _, escrito = ejecutar_con_fecha(get_sheets_service().spreadsheets().values().update(
         spreadsheetId=spreadsheet_id,
         range="A1",
         valueInputOption="RAW",
         body={"values": values}
-    ).execute()
+    ))
+    guardar_outline_en_memoria(spreadsheet_id, escrito, values)
 
     return f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/edit"
 